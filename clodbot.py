@@ -14,6 +14,8 @@ from commands.managesheet import ManageSheet
 from sheets.sheet import authenticate_sheet
 from errors import *
 from server_stats import publish_stats
+from smogon.snapshot import refresh_smogon
+from smogon.prompts import report_prompts
 
 intents = discord.Intents.default()
 intents.guilds = True
@@ -27,20 +29,29 @@ bot = commands.Bot(
     case_insensitive=True,
     help_command=None,
 )
+background_started = False
 
 
 @bot.event
 async def on_ready():
-    # Print a message when the bot connects to Discord and publishes bot stats.
+    # Print a message when the bot connects to Discord, then publishes bot stats, reports prompt metrics and loads Smogon data on the first connection only, since on_ready fires again after reconnects.
+    global background_started
     print(f"{bot.user} has connected to Discord!")
     await bot.change_presence(activity=discord.Activity(type=discord.ActivityType.listening, name="clodbot, help"))
+    if background_started:
+        return
+    background_started = True
     bot.loop.create_task(publish_stats(bot))
+    bot.loop.create_task(report_prompts())
+    bot.loop.create_task(refresh_smogon())
 
 
 @bot.event
 async def on_interaction(interaction: discord.Interaction) -> None:
-    # Displays set information and changes button style if necessary when a button is clicked.
-    if interaction.type == discord.InteractionType.component:
+    # Displays set information and changes button style if necessary when a button is clicked, passing every other interaction on to slash commands and their autocomplete, since this handler replaces the one that would.
+    if interaction.type != discord.InteractionType.component:
+        await bot.process_application_commands(interaction)
+    else:
         custom_id = interaction.data["custom_id"]
         parts = custom_id.split("_")
         prompt_key = parts[0]
@@ -80,6 +91,15 @@ async def on_command_error(ctx: commands.Context, error: commands.CommandError)
         await ctx.send(msg)
 
 
+@bot.event
+async def on_application_command_error(ctx: discord.ApplicationContext, error: discord.DiscordException) -> None:
+    # Handles if a slash command fails, showing the error only to the user who used it.
+    msg = str(error).split(": ", 2)[-1]
+    if not msg.strip():
+        msg = "An unknown error occurred."
+    await ctx.respond(msg, ephemeral=True)
+
+
 @bot.command(name="help")
 async def help(ctx: commands.Context) -> None:
     # Displays all commands with a link to the website for help.
@@ -99,7 +119,11 @@ async def help(ctx: commands.Context) -> None:
         "> \n"
         "> **Clodbot, giveset (Pokemon) (Optional Generation) (Optional Format) [Multiple Using Commas]** to display prompt(s) for set selection based on the provided parameters.\n"
         "> \n"
-        "> **Clodbot, giveset random (Optional Number)** to display random set(s) for the specified amount of random Pokemon.\n\n"
+        "> **Clodbot, giveset random (Optional Number)** to display random set(s) for the specified amount of random Pokemon.\n"
+        "> \n"
+        "> **Clodbot, giveset search (Optional Generation) (Optional Format) (Move/Item/Ability/Tera Type/Nature) [Multiple Using Commas]** to display the sets running everything listed. Tera Types are written as 'Tera (Type)'.\n"
+        "> \n"
+        "> **/giveset (Pokemon) (Optional Generation) (Optional Format) (Optional Set)** to display a set, or a prompt for set selection if no set is given, with names suggested as you type.\n\n"
         "For more information, please visit the official website for Clodbot [**HERE**](https://clodbot.com)."
     )
     await ctx.send(message)
@@ -227,6 +251,8 @@ async def give_set(ctx: commands.Context, *args: str) -> None:
     invalid_parts = []
     if input_str.lower().startswith("random"):
         await GiveSet.fetch_random_sets(ctx, input_str)
+    elif input_str.lower().split(maxsplit=1)[:1] == ["search"]:
+        await GiveSet.search_sets(ctx, input_str)
     else:
         parts = [part.strip() for part in input_str.split(",")]
         for part in parts:
@@ -245,6 +271,18 @@ async def give_set(ctx: commands.Context, *args: str) -> None:
             await ctx.send(InvalidParts(invalid_parts).args[0])
         await GiveSet.set_prompt(ctx, requests)
 
+@bot.slash_command(name="giveset", description="Gives a Pokemon set from Smogon, suggesting names as you type.")
+async def give_set_slash(
+    ctx: discord.ApplicationContext,
+    pokemon: discord.Option(str, "Pokemon", autocomplete=GiveSet.complete_pokemon),
+    generation: discord.Option(str, "Generation", autocomplete=GiveSet.complete_generation, required=False, default=None),
+    format: discord.Option(str, "Format", autocomplete=GiveSet.complete_format, required=False, default=None),
+    set_name: discord.Option(str, "Set", name="set", autocomplete=GiveSet.complete_set_name, required=False, default=None),
+) -> None:
+    # Gives the named Pokemon set, or a prompt for set selection if no set is named.
+    await GiveSet.give_set(ctx, pokemon, generation, format, set_name)
+
+
 def clean_replay_link(url: str) -> str:
     # Cleans replay link if there is additional information after the raw link
     u = urlparse(url.strip())
@@ -258,8 +296,9 @@ def clean_replay_link(url: str) -> str:
         path = path[:-5]
     return urlunparse((u.scheme, u.netloc, path, '', '', ''))
 
-load_dotenv()
-bot_token = os.environ["DISCORD_BOT_TOKEN"]
-bot.run(bot_token)
+if __name__ == "__main__":
+    load_dotenv()
+    bot_token = os.environ["DISCORD_BOT_TOKEN"]
+    bot.run(bot_token)
 
 
@@ -2,9 +2,6 @@
 The functions to give Pokemon sets from Smogon based on different types of criteria.
 """
 
-import asyncio
-import random
-import aiohttp
 import discord
 from discord import ButtonStyle, Button
 from discord.ui import View
@@ -17,18 +14,6 @@ from errors import *
 
 class GiveSet:
     awaiting_response = {}
-    first_row = {}
-
-    @staticmethod
-    async def fetch_pokemon() -> List[str]:
-        # Retrieves a list of all Pokemon using PokeAPI.
-        url = "https://pokeapi.co/api/v2/pokemon-species?limit=10000"
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    pokemon_names = [species["name"] for species in data["results"]]
-                    return pokemon_names
 
     @staticmethod
     async def fetch_set(
@@ -38,29 +23,16 @@ class GiveSet:
         format: Optional[str] = None,
     ) -> str:
         # Fetches and displays set data based on Pokemon, Generation, Format and Set names given.
-        if not generation:
-            generation = await get_latest_gen(pokemon)
-        if not generation:
+        (resolved,) = await resolve_requests(
+            [{"pokemon": pokemon, "generation": generation, "format": format}]
+        )
+        if resolved is None:
             return None
-        url = f"https://pkmn.github.io/smogon/data/sets/{generation}.json"
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    pokemon_key = find_pokemon_key(data, pokemon)
-                    if not pokemon_key:
-                        return None
-                    pokemon_data = data[pokemon_key]
-                    if not format:
-                        format = await get_first_format(pokemon_key, generation)
-                    if format and format in pokemon_data:
-                        format_data = pokemon_data[format]
-                        for moveset_name, moveset in format_data.items():
-                            if (
-                                moveset_name.lower().replace(" ", "")
-                                == set_name.lower()
-                            ):
-                                return format_set(pokemon_key, moveset)
+        for moveset_name, moveset in resolved.movesets.items():
+            if get_set_key(moveset_name) == set_name.lower():
+                return get_formatted_set(
+                    resolved.pokemon, resolved.generation, resolved.format, moveset_name, moveset
+                )
         return None
 
     @staticmethod
@@ -73,65 +45,104 @@ class GiveSet:
             num = int(args_list[1])
         else:
             raise InvalidRandom()
-        pokemon = await GiveSet.fetch_pokemon()
-        loop = asyncio.get_event_loop()
+        index = await load_species_index()
         formatted_sets = []
-        while len(formatted_sets) < num:
-            remaining = num - len(formatted_sets)
-            selected_pokemon = random.sample(pokemon, k=min(remaining, len(pokemon)))
-            tasks = [
-                loop.create_task(GiveSet.fetch_randomset_async(pokemon))
-                for pokemon in selected_pokemon
-            ]
-            results = await asyncio.gather(*tasks)
-            formatted_sets.extend([i for i in results if i is not None])
-            for p in results:
-                if p and p[0] in pokemon:
-                    pokemon.remove(p[0])
+        for pokemon, generation, format, set_name in index.sample_sets(num):
+            data = await get_gen_data(generation) or {}
+            moveset = data.get(pokemon, {}).get(format, {}).get(set_name)
+            if moveset is not None:
+                formatted_sets.append(get_formatted_set(pokemon, generation, format, set_name, moveset))
         await ctx.send(f"```\n" + "\n\n".join(formatted_sets) + "\n```")
 
     @staticmethod
-    async def fetch_randomset_async(pokemon: str) -> Optional[str]:
-        # Helper function for fetching random sets asynchronously to save time.
-        random_gen = await get_random_gen(pokemon)
-        if not random_gen:
-            return None
-        random_format = await get_random_format(pokemon, random_gen)
-        if not random_format:
-            return None
-        random_set = await get_random_set(pokemon, random_gen, random_format)
-        if not random_set:
-            return None
-        formatted_set = await GiveSet.fetch_set(
-            random_set, pokemon, random_gen, random_format
-        )
-        return formatted_set
+    async def search_sets(ctx: commands.Context, input_str: str) -> None:
+        # Displays the sets running every given move, item, ability, Tera Type and nature, optionally within a Generation and Format.
+        index = await load_species_index()
+        generation, format, terms = parse_search(index, input_str[len("search"):])
+        if not terms:
+            raise InvalidSearch()
+        results = index.search(terms, generation, format)
+        if not results:
+            raise NoSearchResults(terms)
+        await ctx.send(get_search_results(results))
+
+    @staticmethod
+    async def give_set(
+        ctx: discord.ApplicationContext,
+        pokemon: str,
+        generation: Optional[str] = None,
+        format: Optional[str] = None,
+        set_name: Optional[str] = None,
+    ) -> None:
+        # Displays the named set directly, or a prompt for set selection if no set is named. Finding a named set may have to fetch Smogon data, so the interaction is deferred first and the set or error is sent as a followup.
+        generation = (get_gen_key(generation) or generation) if generation else None
+        format = format.lower() if format else None
+        if set_name:
+            await ctx.defer()
+            set_data = await GiveSet.fetch_set(get_set_key(set_name), pokemon, generation, format)
+            if not set_data:
+                parts = [part for part in (pokemon, generation, format, set_name) if part]
+                raise InvalidRequest([" ".join(f"**{part}**" for part in parts)])
+            await ctx.followup.send(f"```\n{set_data}\n```")
+            return
+        await ctx.respond(f"Finding sets for **{pokemon}**...", ephemeral=True)
+        await GiveSet.set_prompt(ctx, [{"pokemon": pokemon, "generation": generation, "format": format}])
+
+    @staticmethod
+    async def complete_pokemon(ctx: discord.AutocompleteContext) -> List[str]:
+        # Suggests Pokemon with sets, only those in the chosen Generation if there is one.
+        generation = get_gen_key(ctx.options.get("generation") or "")
+        return species_index.complete_species(ctx.value or "", generation)
+
+    @staticmethod
+    async def complete_generation(ctx: discord.AutocompleteContext) -> List[str]:
+        # Suggests Generations, only those the chosen Pokemon has sets in if it has any.
+        return complete_generations(ctx.value or "", ctx.options.get("pokemon"))
+
+    @staticmethod
+    async def complete_format(ctx: discord.AutocompleteContext) -> List[str]:
+        # Suggests Formats, only those the chosen Pokemon has sets in within the chosen Generation if given.
+        generation = get_gen_key(ctx.options.get("generation") or "")
+        return species_index.complete_formats(ctx.value or "", ctx.options.get("pokemon"), generation)
+
+    @staticmethod
+    async def complete_set_name(ctx: discord.AutocompleteContext) -> List[str]:
+        # Suggests set names, only those of the chosen Pokemon, Generation and Format if given.
+        generation = get_gen_key(ctx.options.get("generation") or "")
+        format = (ctx.options.get("format") or "").lower() or None
+        return species_index.complete_set_names(ctx.value or "", ctx.options.get("pokemon"), generation, format)
 
     @staticmethod
     async def set_prompt(
         ctx: commands.Context, requests: List[Dict[str, Optional[str]]]
     ) -> None:
         # Displays prompt with buttons for selection of Pokemon sets.
-        tasks = [
-            get_set_names(req["pokemon"], req["generation"], req["format"])
-            for req in requests
-        ]
-        results = await asyncio.gather(*tasks)
+        corrections = correct_requests(await load_species_index(), requests)
+        if corrections:
+            await ctx.send(CorrectedPokemon(corrections).args[0])
+        resolved = await resolve_requests(requests)
+        results = [list(sets.movesets) if sets else None for sets in resolved]
         valid_requests, valid_results = await filter_requests(ctx, requests, results)
+        valid_resolved = [sets for sets in resolved if sets and sets.movesets]
         if not valid_requests:
             return
         prompt_key = uuid4().hex[:20]
+        state = prompt_store.create(prompt_key)
         request_count = len(valid_requests)
         prompt = get_prompt(valid_requests)
         await ctx.send(prompt)
-        for index, (request, set_names) in enumerate(
-            zip(valid_requests, valid_results)
+        for index, (request, set_names, sets) in enumerate(
+            zip(valid_requests, valid_results, valid_resolved)
         ):
             message_key = uuid4().hex[:5]
+            state.choices[message_key] = {
+                get_set_key(name): (sets.pokemon, sets.generation, sets.format, name, moveset)
+                for name, moveset in sets.movesets.items()
+            }
             view = get_view(prompt_key, message_key, request, set_names, request_count)
             message = await ctx.send(view=view)
             if index == 0:
-                GiveSet.first_row[prompt_key] = message.id
+                state.first_row = message
 
     @staticmethod
     async def set_selection(
@@ -145,23 +156,26 @@ class GiveSet:
         generation: Optional[str] = None,
         format: Optional[str] = None,
     ):
-        # Fetches and displays the appropriate set data when a button is clicked.
-        deselected = message_key + button_key in selected_states.get(prompt_key, [])
+        # Displays the appropriate set data when a button is clicked, using the sets resolved when the prompt was shown.
+        state = prompt_store.get(prompt_key)
+        if state is None:
+            await interaction.followup.send(PromptExpired().args[0], ephemeral=True)
+            return
+        deselected = state.selected.get(message_key) == button_key
         if deselected:
-            await remove_set(prompt_key, message_key, button_key)
+            await remove_set(state, message_key, button_key)
         else:
-            set_data = await GiveSet.fetch_set(set_name, pokemon, generation, format)
-            await add_set(prompt_key, message_key, button_key, set_data)
-        set_data = "\n\n".join(
-            "\n\n".join(data for data in sets)
-            for sets in selected_sets.get(prompt_key, {}).values()
-        )
-        first_row = GiveSet.first_row.get(prompt_key)
-        first_message = await interaction.channel.fetch_message(first_row)
-        selected_row = await interaction.channel.fetch_message(interaction.message.id)
+            choice = state.choices.get(message_key, {}).get(set_name.lower())
+            if choice:
+                set_data = get_formatted_set(*choice)
+            else:
+                set_data = await GiveSet.fetch_set(set_name, pokemon, generation, format)
+            await add_set(state, message_key, button_key, set_data)
+        set_data = "\n\n".join(data for data in state.sets.values() if data)
+        selected_row = interaction.message
         updated_view = update_buttons(
             selected_row, interaction.data["custom_id"], deselected, request_count > 1
         )
         updated_content = f"```\n{set_data}```\n" if set_data else ""
         await selected_row.edit(view=updated_view)
-        await first_message.edit(content=updated_content)
+        await state.first_row.edit(content=updated_content)
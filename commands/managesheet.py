@@ -2,13 +2,12 @@
 The functions to manage Google Sheets in association with Pokemon Showdown replay data. 
 """
 
-import requests
-import json
-import requests
 from discord.ext import commands
 from google.oauth2.credentials import Credentials
 from googleapiclient.discovery import build
 from showdown.replay import *
+from showdown.pool import *
+from showdown.store import *
 from sheets.sheet import *
 from sheets.web import *
 from errors import *
@@ -33,13 +32,8 @@ class ManageSheet:
             service.spreadsheets().get(spreadsheetId=spreadsheet_id).execute()
         )
         sheet_title = sheet_metadata["properties"]["title"]
-        try:
-            response = requests.get(replay_link + ".json")
-            response.raise_for_status()
-            json_data = json.loads(response.text)
-        except requests.exceptions.RequestException:
-            raise InvalidReplay(replay_link)
-        stats, _ = get_stats(json_data)
+        players, result = await analyze_replay_link(replay_link, "players", "result")
+        stats = result.to_dict()
         sheets = sheet_metadata.get("sheets", "")
         sheet_id = None
         for sheet in sheets:
@@ -70,7 +64,7 @@ class ManageSheet:
         ):
             add_week(service, spreadsheet_id, sheet_id, sheet_name, week)
         for player_name, pokemon_data in stats.items():
-            player_name = get_replay_players(json_data)[player_name]
+            player_name = players[player_name]
             if player_name.lower() in {k.lower(): v for k, v in name_dict.items()}:
                 player_name = name_dict[
                     {k.lower(): k for k in name_dict}[player_name.lower()]
@@ -17,6 +17,7 @@ class InvalidCommand(Exception):
             "Clodbot, sheet list (Optional Google Sheets Link) (Optional Sheet Name) ['Players' OR 'Pokemon']\n"
             "Clodbot, giveset (Pokemon) (Optional Generation) (Optional Format) [Multiple Using Commas]\n"
             "Clodbot, giveset random (Optional Number)\n"
+            "Clodbot, giveset search (Optional Generation) (Optional Format) (Move/Item/Ability/Tera Type/Nature) [Multiple Using Commas]\n"
             "```"
         )
 
@@ -27,6 +28,16 @@ class InvalidReplay(Exception):
         super().__init__(f"**{link}** is an invalid replay link.")
 
 
+class ReplayTooLong(Exception):
+    # Exception raised when analyzing a replay takes more CPU time than allowed.
+    def __init__(self):
+        super().__init__("This replay is too long to analyze.")
+
+    def __reduce__(self):
+        # Rebuilds the exception without arguments when it is sent back from a worker process.
+        return (ReplayTooLong, ())
+
+
 class InvalidRandom(Exception):
     # Exception raised for invalid number provided for the random command.
     def __init__(self):
@@ -37,12 +48,42 @@ class InvalidRandom(Exception):
         )
 
 
+class InvalidSearch(Exception):
+    # Exception raised when a set search has nothing to search for.
+    def __init__(self):
+        super().__init__(
+            "Please follow this format:\n"
+            "```Clodbot, giveset search (Optional Generation) (Optional Format) (Move/Item/Ability/Tera Type/Nature) [Multiple Using Commas]\n"
+            "```"
+        )
+
+
+class NoSearchResults(Exception):
+    # Exception raised when no set matches a set search.
+    def __init__(self, terms):
+        super().__init__("Cannot find sets with " + ", ".join(f"**{term}**" for term in terms) + ".")
+
+
 class InvalidRequest(Exception):
     # Exception raised when an invalid Pokemon set request is found.
     def __init__(self, requests):
         super().__init__("Cannot find sets for " + ", ".join(requests) + ".")
 
 
+class CorrectedPokemon(Exception):
+    # Exception raised when misspelled Pokemon names are replaced with the closest names with sets.
+    def __init__(self, corrections):
+        super().__init__("Did you mean " + ", ".join(corrections) + "? Showing sets for those instead.")
+
+
+class PromptExpired(Exception):
+    # Exception raised when a button is clicked on a set prompt that is no longer kept.
+    def __init__(self):
+        super().__init__(
+            "This prompt has expired. Please use the giveset command again."
+        )
+
+
 class InvalidParts(Exception):
     # Exception raised when too many parts of a giveset command is used.
     def __init__(self, parts):
@@ -96,6 +137,7 @@ class NoGiveSet(Exception):
             "```\n"
             "Clodbot, giveset (Pokemon) (Optional Generation) (Optional Format) [Multiple Using Commas]\n"
             "Clodbot, giveset random (Optional Number)\n"
+            "Clodbot, giveset search (Optional Generation) (Optional Format) (Move/Item/Ability/Tera Type/Nature) [Multiple Using Commas]\n"
             "```"
         )
 
@@ -0,0 +1,93 @@
+"""
+The shared HTTP client for every outbound request Clodbot makes while running.
+"""
+
+import json
+import asyncio
+import aiohttp
+from typing import Optional, Dict, Mapping, Any, Awaitable, Callable, Hashable, NamedTuple, TypeVar
+
+HTTP_TIMEOUT = 15
+HTTP_RETRIES = 3
+HTTP_BACKOFF = 0.5
+HOST_CONNECTIONS = 8
+TOTAL_CONNECTIONS = 64
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+T = TypeVar("T")
+
+
+class HttpResponse(NamedTuple):
+    # The status, headers and body of a finished request.
+    status: int
+    headers: Mapping[str, str]
+    body: bytes
+
+
+class SingleFlight:
+    # Shares one in-flight call among all concurrent callers asking for the same key.
+    def __init__(self):
+        self.calls: Dict[Hashable, asyncio.Future] = {}
+
+    async def run(self, key: Hashable, call: Callable[[], Awaitable[T]]) -> T:
+        # Awaits the call already running for the key, or starts it if there is none.
+        future = self.calls.get(key)
+        if future is None:
+            future = asyncio.ensure_future(call())
+            self.calls[key] = future
+            future.add_done_callback(lambda done: self.forget(key, done))
+        return await asyncio.shield(future)
+
+    def forget(self, key: Hashable, future: asyncio.Future) -> None:
+        # Removes a finished call so the next caller for the key starts a new one.
+        if self.calls.get(key) is future:
+            del self.calls[key]
+
+
+class HttpClient:
+    # One pooled keep-alive session for the bot's lifetime, with per-host connection limits, timeouts and retries.
+    def __init__(self):
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.flights = SingleFlight()
+
+    def get_session(self) -> aiohttp.ClientSession:
+        # Returns the shared session, creating it on the running event loop the first time it is needed.
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=TOTAL_CONNECTIONS, limit_per_host=HOST_CONNECTIONS, ttl_dns_cache=300
+            )
+            self.session = aiohttp.ClientSession(
+                connector=connector, timeout=aiohttp.ClientTimeout(total=HTTP_TIMEOUT)
+            )
+        return self.session
+
+    async def fetch(self, url: str, headers: Optional[Dict[str, str]] = None) -> Optional[HttpResponse]:
+        # Sends a GET request, retrying connection errors, timeouts and transient statuses, or returns None if every attempt fails.
+        for attempt in range(HTTP_RETRIES):
+            if attempt:
+                await asyncio.sleep(HTTP_BACKOFF * 2 ** (attempt - 1))
+            try:
+                async with self.get_session().get(url, headers=headers) as response:
+                    if response.status in RETRY_STATUSES and attempt < HTTP_RETRIES - 1:
+                        continue
+                    return HttpResponse(response.status, response.headers.copy(), await response.read())
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                continue
+        return None
+
+    async def get_json(self, url: str) -> Optional[Any]:
+        # Returns the decoded JSON body of a successful request, or None if the request fails or the body is not JSON. Concurrent calls for the same URL share one request.
+        return await self.flights.run(url, lambda: self.load_json(url))
+
+    async def load_json(self, url: str) -> Optional[Any]:
+        # Requests the URL and decodes its JSON body.
+        response = await self.fetch(url)
+        if response is None or response.status != 200:
+            return None
+        try:
+            return json.loads(response.body)
+        except ValueError:
+            return None
+
+
+http_client = HttpClient()
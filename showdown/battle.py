@@ -0,0 +1,175 @@
+"""
+Tracks the battle state of a Pokemon Showdown replay while walking its log forwards.
+"""
+
+from typing import Optional, Dict, Tuple, Iterator, Callable
+from showdown.events import *
+
+TOXIC_MOVES = ["Toxic", "Malignant Chain", "Toxic Spikes", "Toxic Chain"]
+POISON_MOVES = [
+    "Sludge", "Sludge Bomb", "Sludge Wave", "Gunk Shot", "Smog", "Poison Fang",
+    "Poison Jab", "Poison Sting", "Poison Tail", "Poison Gas", "Poison Powder",
+    "Fling", "Cross Poison", "Toxic Thread", "Twineedle", "Barb Barrage",
+    "Shell Side Arm", "Mortal Spin", "Dire Claw", "Secret Power",
+    "G-Max Befuddle", "G-Max Malodor", "G-Max Stun Shock", "Poison Point"
+]
+BURN_MOVES = [
+    "Will-O-Wisp", "Lava Plume", "Flamethrower", "Fire Blast", "Flare Blitz",
+    "Heat Wave", "Scald", "Scorching Sands", "Blaze Kick", "Fire Fang",
+    "Fire Punch", "Ember", "Flame Wheel", "Burning Jealousy", "Inferno",
+    "Pyro Ball", "Infernal Parade", "Blue Flare", "Searing Shot",
+    "Steam Eruption", "Tri Attack", "Secret Power", "Fling",
+    "Matcha Gotcha", "Sacred Fire", "Sandsear Storm"
+]
+HAZARD_MOVES = {"Stealth Rock": "Stealth Rock", "Spikes": "Spikes", "Ceaseless Edge": "Spikes"}
+STATUS_ABILITIES = {
+    ("tox", "Toxic Chain"): "psn",
+    ("psn", "Poison Point"): "psn",
+    ("brn", "Flame Body"): "brn",
+}
+STATUS_COPIERS = {
+    ("tox", "Psycho Shift"): "psn",
+    ("psn", "Psycho Shift"): "psn",
+    ("tox", "Synchronize"): "psn",
+    ("psn", "Synchronize"): "psn",
+    ("brn", "Synchronize"): "brn",
+}
+
+
+def get_opponent(player: str) -> str:
+    # Returns the player number of the opposing side.
+    return "2" if player == "1" else "1"
+
+
+def is_status(event: Optional[Event], status: str) -> bool:
+    # Returns whether the event inflicts the given status.
+    return event is not None and event.kind == "-status" and len(event.args) > 1 and event.args[1] == status
+
+
+class BattleState:
+    # Who set each hazard on each side, who statused each Pokemon, who started each weather and who last attacked.
+    def __init__(self, log: ReplayLog):
+        self.log = log
+        self.hazards: Dict[Tuple[str, str], Tuple[str, str]] = {}
+        self.statuses: Dict[Tuple[str, str, str], Tuple[str, str]] = {}
+        self.weather: Dict[str, Tuple[str, str]] = {}
+        self.seeders: Dict[str, Tuple[str, str]] = {}
+        self.movers: Dict[str, Dict[str, None]] = {}
+        self.handlers = {
+            "move": self.record_move,
+            "-status": self.record_status,
+            "-weather": self.record_weather,
+        }
+
+    def update(self, event: Event) -> None:
+        # Applies the event to the battle state.
+        handler = self.handlers.get(event.kind)
+        if handler:
+            handler(event)
+        if "[from] Leech Seed" in event.args[:-1]:
+            self.record_seed(event)
+
+    def add_status(self, status: str, target: Tuple[str, str], source: Optional[Tuple[str, str]]) -> None:
+        # Records the source of a status on the target if the source is on the opposing side.
+        if source and source[0] != target[0]:
+            self.statuses[(status, target[0], target[1].strip())] = (f"p{source[0]}", source[1].strip())
+
+    def record_move(self, event: Event) -> None:
+        # Records the user as the latest attacker of its side, along with any hazard or status it set.
+        user = parse_ident(event.args[0]) if len(event.args) > 1 else None
+        if not user:
+            return
+        move = event.args[1]
+        movers = self.movers.setdefault(user[0], {})
+        movers.pop(user[1].strip(), None)
+        movers[user[1].strip()] = None
+        if len(event.args) < 3:
+            return
+        if move in HAZARD_MOVES:
+            self.hazards[(HAZARD_MOVES[move], get_opponent(user[0]))] = (f"p{user[0]}", user[1].strip())
+        target = parse_ident(event.args[2])
+        if not target:
+            return
+        if move in TOXIC_MOVES and is_status(self.log.next_line(event), "tox"):
+            self.add_status("psn", target, user)
+        if move in POISON_MOVES and is_status(self.log.next_line(event, 2), "psn"):
+            self.add_status("psn", target, user)
+        if move in BURN_MOVES and is_status(self.log.next_line(event, 2), "brn"):
+            self.add_status("brn", target, user)
+
+    def record_status(self, event: Event) -> None:
+        # Records a status inflicted or passed on by an ability.
+        target = parse_ident(event.args[0]) if len(event.args) > 1 else None
+        if not target:
+            return
+        status = event.args[1]
+        if (
+            len(event.args) > 3
+            and event.args[2].startswith("[from] ability: ")
+            and event.args[3].startswith("[of] ")
+            and (status, event.args[2][16:]) in STATUS_ABILITIES
+        ):
+            self.add_status(STATUS_ABILITIES[(status, event.args[2][16:])], target, parse_ident(event.args[3][5:]))
+        previous = self.log.events[event.index - 1] if event.index > 0 else None
+        if (
+            previous is not None
+            and len(previous.args) > 1
+            and previous.args[-1].startswith("ability: ")
+            and (status, previous.args[-1][9:]) in STATUS_COPIERS
+        ):
+            self.add_status(STATUS_COPIERS[(status, previous.args[-1][9:])], target, parse_ident(previous.args[-2]))
+
+    def record_weather(self, event: Event) -> None:
+        # Records the Pokemon whose ability started the weather.
+        if (
+            len(event.args) > 2
+            and event.args[1].startswith("[from] ability: ")
+            and event.args[2].startswith("[of] ")
+            and event.args[2][7:8] == "a"
+        ):
+            starter = parse_ident(event.args[2][5:])
+            if starter:
+                self.weather[event.args[0]] = (f"p{starter[0]}", starter[1].strip())
+
+    def record_seed(self, event: Event) -> None:
+        # Records the Pokemon draining the opposing side with Leech Seed.
+        source = event.args[event.args.index("[from] Leech Seed") + 1]
+        seeder = parse_ident(source[5:]) if source.startswith("[of] ") else None
+        if seeder:
+            self.seeders[get_opponent(seeder[0])] = (f"p{seeder[0]}", seeder[1].strip())
+
+    def get_hazard_setter(self, hazard: str, side: str) -> Optional[Tuple[str, str]]:
+        # Returns the player and Pokemon that last set the hazard on the side.
+        return self.hazards.get((hazard, side))
+
+    def get_status_source(self, status: str, side: str, pokemon: str) -> Optional[Tuple[str, str]]:
+        # Returns the opposing player and Pokemon that last inflicted the status on the Pokemon.
+        return self.statuses.get((status, side, pokemon))
+
+    def get_weather_setter(self, weather: str) -> Optional[Tuple[str, str]]:
+        # Returns the player and Pokemon whose ability last started the weather.
+        return self.weather.get(weather)
+
+    def get_seeder(self, side: str) -> Optional[Tuple[str, str]]:
+        # Returns the opposing player and Pokemon that last drained the side with Leech Seed.
+        return self.seeders.get(side)
+
+    def get_attacker(self, side: str, is_known: Callable[[str], bool]) -> Optional[str]:
+        # Returns the opposing Pokemon that most recently used a move, skipping and forgetting Pokemon that are not known.
+        movers = self.movers.get(get_opponent(side), {})
+        while movers:
+            nickname = next(reversed(movers))
+            if is_known(nickname):
+                return nickname
+            del movers[nickname]
+        return None
+
+
+def replay_state(log: ReplayLog) -> Iterator[Tuple[Event, BattleState]]:
+    # Walks the log forwards, yielding each faint along with the battle state just before it.
+    state = BattleState(log)
+    for event in log.events:
+        check_budget(event.index)
+        if event.kind == "faint":
+            yield event, state
+        state.update(event)
@@ -0,0 +1,130 @@
+"""
+Times replay analysis on long and adversarial synthetic replays. Run with "python -m showdown.benchmark".
+"""
+
+import gc
+import sys
+from time import process_time
+from typing import Callable, Dict, List, Tuple
+from showdown.replay import *
+
+SPECIES = ["Garchomp", "Tyranitar", "Toxapex", "Ferrothorn", "Gholdengo", "Clefable"]
+MAX_SECONDS = 1.0
+# Doubling the turns of a linear case roughly doubles its time and of a quadratic one quadruples it, leaving room for timer noise in between.
+MAX_GROWTH = 3.5
+MIN_SECONDS = 0.1
+RUNS = 7
+
+
+def create_replay(turns: List[List[str]], teams: Dict[str, List[Tuple[str, str]]]) -> Dict[str, object]:
+    # Builds replay JSON data from team previews and the lines of each turn.
+    lines = ["|player|p1|Alice|1", "|player|p2|Bob|2"]
+    for player, team in teams.items():
+        lines.extend(f"|poke|{player}|{species}, L50|" for species, _ in team)
+    lines.append("|start")
+    for player, team in teams.items():
+        lines.append(f"|switch|{player}a: {team[0][1]}|{team[0][0]}, L50|100/100")
+    for number, turn in enumerate(turns, 1):
+        lines.extend(["|", f"|turn|{number}"])
+        lines.extend(turn)
+    lines.extend(["|", "|win|Alice"])
+    return {"players": ["Alice", "Bob"], "log": "\n".join(lines) + "\n"}
+
+
+def create_battle(turns: int) -> Dict[str, object]:
+    # Builds a battle with hazards, statuses, Leech Seed and attacks on every turn, with a faint every tenth turn.
+    teams = {player: [(species, species) for species in SPECIES] for player in ("p1", "p2")}
+    lines = []
+    for number in range(turns):
+        user, target = ("p1", "p2") if number % 2 else ("p2", "p1")
+        attacker, defender = SPECIES[number % 6], SPECIES[(number + 1) % 6]
+        turn = [
+            f"|switch|{user}a: {attacker}|{attacker}, L50|100/100",
+            f"|switch|{target}a: {defender}|{defender}, L50|100/100",
+            f"|move|{user}a: {attacker}|Stealth Rock|{target}a: {defender}",
+            f"|move|{user}a: {attacker}|Toxic|{target}a: {defender}",
+            f"|-status|{target}a: {defender}|tox",
+            f"|-damage|{target}a: {defender}|50/100|[from] Leech Seed|[of] {user}a: {attacker}",
+        ]
+        if number % 10 == 0:
+            turn.extend([f"|-damage|{target}a: {defender}|0 fnt|[from] psn", f"|faint|{target}a: {defender}"])
+        lines.append(turn)
+    return create_replay(lines, teams)
+
+
+def create_blessings(turns: int) -> Dict[str, object]:
+    # Builds a battle where Revival Blessing is used every turn without ever reviving anything.
+    teams = {player: [(species, species) for species in SPECIES] for player in ("p1", "p2")}
+    lines = [["|move|p1a: Garchomp|Revival Blessing|p1a: Garchomp"] for _ in range(turns)]
+    return create_replay(lines, teams)
+
+
+def create_unknown_movers(turns: int) -> Dict[str, object]:
+    # Builds a battle where every move comes from a Pokemon missing from team preview, each followed by a faint.
+    teams = {player: [(species, species) for species in SPECIES] for player in ("p1", "p2")}
+    lines = [
+        [f"|move|p1a: Unknown{number}|Tackle|p2a: Toxapex", "|faint|p2a: Toxapex"]
+        for number in range(turns)
+    ]
+    return create_replay(lines, teams)
+
+
+def create_long_lines(turns: int) -> Dict[str, object]:
+    # Builds a battle whose every line carries thousands of fields.
+    teams = {player: [(species, species) for species in SPECIES] for player in ("p1", "p2")}
+    padding = "|[silent]" * 2000
+    lines = [[f"|-damage|p2a: Toxapex|90/100{padding}", f"|move|p1a: Garchomp|Tackle|p2a: Toxapex{padding}"] for _ in range(turns)]
+    return create_replay(lines, teams)
+
+
+def create_shared_nicknames(turns: int) -> Dict[str, object]:
+    # Builds a battle where many different species are switched in under the same nickname.
+    teams = {"p1": [(f"Species{number}", "Same") for number in range(turns)], "p2": [("Garchomp", "Garchomp")]}
+    lines = [
+        [f"|switch|p1a: Same|Species{number}, L50|100/100", "|move|p2a: Garchomp|Tackle|p1a: Same", "|faint|p1a: Same"]
+        for number in range(turns)
+    ]
+    return create_replay(lines, teams)
+
+
+def time_replay(json_data: Dict[str, object]) -> float:
+    # Returns the CPU time taken to build the message for a replay from scratch, with garbage collection paused so its pauses are not timed.
+    parse_log.cache_clear()
+    gc.collect()
+    gc.disable()
+    try:
+        start = process_time()
+        Replay(json_data).message
+        return process_time() - start
+    finally:
+        gc.enable()
+
+
+def check_case(name: str, create: Callable[[int], Dict[str, object]], turns: int) -> bool:
+    # Times a case at the given length and twice that length, reporting whether both time bounds hold. The two lengths are timed alternately and each takes its best of RUNS runs, so a burst of load on the machine slows both rather than skewing their growth. Growth is measured from at least MIN_SECONDS so timer noise on fast cases cannot fail it.
+    small_replay, large_replay = create(turns), create(turns * 2)
+    small = large = float("inf")
+    for _ in range(RUNS):
+        small = min(small, time_replay(small_replay))
+        large = min(large, time_replay(large_replay))
+    growth = large / max(small, MIN_SECONDS)
+    passed = large <= MAX_SECONDS and growth <= MAX_GROWTH
+    print(f"{name}: {small:.4f}s at {turns} turns, {large:.4f}s at {turns * 2} turns, {'ok' if passed else 'FAILED'}")
+    return passed
+
+
+def main() -> int:
+    # Runs every case, returning a nonzero exit status if any time bound is broken.
+    cases = [
+        ("battle", create_battle, 4000),
+        ("revival blessings", create_blessings, 16000),
+        ("unknown movers", create_unknown_movers, 8000),
+        ("long lines", create_long_lines, 200),
+        ("shared nicknames", create_shared_nicknames, 5000),
+    ]
+    results = [check_case(name, create, turns) for name, create, turns in cases]
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+"""
+Tokenizes Pokemon Showdown replay logs into typed event records.
+"""
+
+import os
+from contextvars import ContextVar
+from functools import lru_cache
+from heapq import merge
+from time import process_time
+from typing import Optional, Dict, List, Tuple, Iterator, NamedTuple
+from errors import *
+
+REPLAY_CPU_BUDGET = float(os.getenv("REPLAY_CPU_BUDGET", "5"))
+BUDGET_INTERVAL = 1024
+
+
+class Event(NamedTuple):
+    # A single "|"-delimited line of a replay log, with its position in the log.
+    index: int
+    kind: str
+    args: Tuple[str, ...]
+    start: int
+    end: int
+
+
+class ReplayBudget:
+    # The CPU time one replay's analysis may use, shared by everything computed while the budget is entered.
+    def __init__(self, seconds: float = REPLAY_CPU_BUDGET):
+        self.seconds = seconds
+        self.used = 0.0
+        self.started = 0.0
+        self.depth = 0
+        self.token = None
+
+    def __enter__(self) -> "ReplayBudget":
+        if self.depth == 0:
+            self.started = process_time()
+            self.token = current_budget.set(self)
+        self.depth += 1
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.depth -= 1
+        if self.depth == 0:
+            self.used += process_time() - self.started
+            current_budget.reset(self.token)
+
+    def check(self) -> None:
+        # Stops the analysis once the budget is spent.
+        if self.used + process_time() - self.started > self.seconds:
+            raise ReplayTooLong()
+
+
+current_budget: ContextVar[Optional[ReplayBudget]] = ContextVar("current_budget", default=None)
+
+
+def check_budget(position: int) -> None:
+    # Checks the budget of the replay being analyzed every BUDGET_INTERVAL steps.
+    if position % BUDGET_INTERVAL == 0:
+        budget = current_budget.get()
+        if budget is not None:
+            budget.check()
+
+
+class ReplayLog:
+    # All events of a replay log in order, along with the events grouped by kind.
+    def __init__(self, events: List[Event]):
+        self.events = events
+        self.kinds: Dict[str, List[Event]] = {}
+        for event in events:
+            self.kinds.setdefault(event.kind, []).append(event)
+
+    def of(self, *kinds: str) -> List[Event]:
+        # Returns the events of the given kinds in log order.
+        if len(kinds) == 1:
+            return self.kinds.get(kinds[0], [])
+        return list(merge(*(self.kinds.get(kind, []) for kind in kinds)))
+
+    def backward(self, index: int) -> Iterator[Event]:
+        # Walks back from the event before the given index towards the start of the log.
+        return (self.events[position] for position in range(index - 1, -1, -1))
+
+    def next_line(self, event: Event, offset: int = 1) -> Optional[Event]:
+        # Returns the event the given number of lines after the event, if the log goes on that far.
+        index = event.index + offset
+        if index >= len(self.events):
+            return None
+        return self.events[index]
+
+
+def parse_ident(ident: str) -> Optional[Tuple[str, str]]:
+    # Splits an active Pokemon identifier such as "p1a: Nickname" into the player number and nickname.
+    if (
+        len(ident) > 5
+        and ident[0] == "p"
+        and ident[1].isdigit()
+        and ident[2] in "ab"
+        and ident[3:5] == ": "
+    ):
+        return ident[1], ident[5:]
+    return None
+
+
+def parse_species(details: str) -> str:
+    # Returns the species from a details field such as "Garchomp, L50, M".
+    return details.split(",", 1)[0]
+
+
+def tokenize_log(log: str) -> ReplayLog:
+    # Splits the log into event records in a single pass.
+    events: List[Event] = []
+    start = 0
+    for position, line in enumerate(log.split("\n")):
+        check_budget(position)
+        end = start + len(line)
+        if line.startswith("|"):
+            fields = line.split("|")
+            events.append(Event(len(events), fields[1], tuple(fields[2:]), start, end))
+        start = end + 1
+    return ReplayLog(events)
+
+
+@lru_cache(maxsize=16)
+def parse_log(log: str) -> ReplayLog:
+    # Returns the tokenized log, reusing the result for repeated calls on the same replay.
+    return tokenize_log(log)
@@ -0,0 +1,66 @@
+"""
+Runs replay analysis in worker processes so parsing does not block the bot's event loop.
+"""
+
+import os
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional, Dict, List, Tuple
+from showdown.replay import *
+
+DEFAULT_REPLAY_WORKERS = 2
+
+executor: Optional[ProcessPoolExecutor] = None
+
+
+def get_worker_count() -> int:
+    # Returns the number of worker processes from REPLAY_WORKERS, where 0 analyzes replays on the event loop.
+    return max(int(os.getenv("REPLAY_WORKERS", str(DEFAULT_REPLAY_WORKERS))), 0)
+
+
+def get_context() -> multiprocessing.context.BaseContext:
+    # Returns a start method that does not fork the bot itself, so workers never inherit its threads' locks or its Smogon caches.
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload(["showdown.pool"])
+        return context
+    return multiprocessing.get_context("spawn")
+
+
+def get_executor() -> Optional[ProcessPoolExecutor]:
+    # Returns the shared process pool, creating it on first use, or None if replays are analyzed synchronously.
+    global executor
+    if executor is None and get_worker_count() > 0:
+        try:
+            executor = ProcessPoolExecutor(max_workers=get_worker_count(), mp_context=get_context())
+        except (NotImplementedError, OSError):
+            return None
+    return executor
+
+
+def shutdown_pool() -> None:
+    # Stops the worker processes, letting the next analysis start a new pool.
+    global executor
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+        executor = None
+
+
+def get_replay_values(json_data: Dict[str, List[str]], names: Tuple[str, ...]) -> Tuple[object, ...]:
+    # Analyzes the replay and returns the requested Replay attributes in order.
+    replay = Replay(json_data)
+    return tuple(getattr(replay, name) for name in names)
+
+
+async def analyze_in_pool(json_data: Dict[str, List[str]], *names: str) -> Tuple[object, ...]:
+    # Analyzes the replay in a worker process, or on the event loop if no pool is available or its workers cannot start, returning the requested Replay attributes.
+    pool = get_executor()
+    if pool is None:
+        return get_replay_values(json_data, names)
+    try:
+        return await asyncio.get_running_loop().run_in_executor(pool, get_replay_values, json_data, names)
+    except (BrokenProcessPool, OSError):
+        shutdown_pool()
+        return get_replay_values(json_data, names)
@@ -2,16 +2,64 @@
 General functions in analyzing Pokemon Showdown replay links.
 """
 
-import re
+from functools import cached_property
 from typing import Optional, Dict, List, Tuple
-
-
-def get_original_pokemon (stats: Dict[str, Dict[str, Dict[str, int]]], player_key: str, nickname: str) -> str:
-    # Given a player's stats mapping and a nickname, return the original pokemon name
-    for original, data in stats.get(player_key, {}).items():
-        if data.get("nickname") == nickname:
-            return original
-    return nickname
+from showdown.battle import *
+from showdown.results import *
+
+# Bump whenever a change to the analysis changes its output, so memoized results are recomputed.
+PARSER_VERSION = 1
+TRANSFORM_FORMS = ["Mega", "Terastal", "Hero", "Busted"]
+FAINT_CAUSES = ["psn", "brn", "Stealth Rock", "Spikes", "Leech Seed", "Sandstorm"]
+
+
+class PokemonIndex:
+    # Per-player mapping from species to nickname and back. A nickname shared by several species resolves to the earliest listed one.
+    def __init__(self):
+        self.species: Dict[str, Dict[str, str]] = {"p1": {}, "p2": {}}
+        self.nicknames: Optional[Dict[str, Dict[str, str]]] = None
+
+    @staticmethod
+    def from_stats(stats: Dict[str, Dict[str, PokemonStats]]) -> "PokemonIndex":
+        # Builds the index from an existing stats mapping.
+        index = PokemonIndex()
+        for player, pokemon in stats.items():
+            for actual_pokemon, data in pokemon.items():
+                index.add(player, actual_pokemon, data.nickname)
+        return index
+
+    def add(self, player: str, pokemon: str, nickname: str) -> None:
+        # Sets the nickname of the species, keeping the species' place if it is already listed.
+        self.species.setdefault(player, {})[pokemon] = nickname
+        self.nicknames = None
+
+    def remove(self, player: str, pokemon: str) -> None:
+        # Removes the species from the index.
+        del self.species[player][pokemon]
+        self.nicknames = None
+
+    def get_nickname(self, player: str, pokemon: str) -> Optional[str]:
+        # Returns the nickname of the species.
+        return self.species.get(player, {}).get(pokemon)
+
+    def get_species(self, player: str, nickname: str) -> Optional[str]:
+        # Returns the species going by the nickname, rebuilding the reverse mapping in one pass after any change.
+        if self.nicknames is None:
+            self.nicknames = {}
+            for species_player, species in self.species.items():
+                nicknames = self.nicknames.setdefault(species_player, {})
+                for pokemon, species_nickname in species.items():
+                    nicknames.setdefault(species_nickname, pokemon)
+        return self.nicknames.get(player, {}).get(nickname)
+
+
+def get_original_pokemon (index: PokemonIndex, player_key: str, nickname: str) -> str:
+    # Given a player's nickname index and a nickname, return the original pokemon name
+    return index.get_species(player_key, nickname) or nickname
+
+def get_log(json_data: Dict[str, List[str]]) -> ReplayLog:
+    # Retrieves the tokenized replay log.
+    return parse_log(json_data.get("log", ""))
 
 def get_replay_players(json_data: Dict[str, List[str]]) -> Dict[str, str]:
     # Retrieves player names.
@@ -22,70 +70,95 @@ def get_replay_players(json_data: Dict[str, List[str]]) -> Dict[str, str]:
     return players_dict
 
 
-def get_replay_pokemon(json_data: Dict[str, List[str]]) -> Dict[str, Dict[str, str]]:
-    # Retrieves Pokemon names and groups them in terms of player. Each entry is a mapping from nickname to actual name.
-    log = json_data.get("log", "")
-    all_pokemon = {"p1": {}, "p2": {}}
-    if "|poke|" in log:
-        pokemon_regex = re.compile(r"\|poke\|(p\d)[ab]?\|([^,|]+)")
-        for match in pokemon_regex.finditer(log):
-            player, pokemon = match.groups()
-            pokemon = pokemon.strip().replace("-*", "")
-            all_pokemon[player][pokemon] = pokemon
-    event_regex = re.compile(r"\|(switch|replace)\|(p\d)[ab]: (.+?)\|([^,|]+)")
-    for match in event_regex.finditer(log):
-        event_type, player, nickname, pokemon = match.groups()
-        pokemon = pokemon.strip()
-        nickname = nickname.strip()
+def split_form(pokemon: str) -> Optional[Tuple[str, str]]:
+    # Splits a transformed Pokemon such as "Charizard-Mega-X" into its base Pokemon and form.
+    position = pokemon.rfind("-")
+    while position > 0:
+        for form in TRANSFORM_FORMS:
+            if pokemon.startswith(form, position + 1):
+                return pokemon[:position], form
+        position = pokemon.rfind("-", 0, position)
+    return None
+
+
+def get_replay_index(json_data: Dict[str, List[str]]) -> PokemonIndex:
+    # Retrieves Pokemon names and their nicknames for each player, following switches and forme changes.
+    log = get_log(json_data)
+    index = PokemonIndex()
+    all_pokemon = index.species
+    for event in log.of("poke"):
+        if len(event.args) < 2 or not event.args[0][:2] in all_pokemon:
+            continue
+        player = event.args[0][:2]
+        pokemon = parse_species(event.args[1]).strip().replace("-*", "")
+        if pokemon:
+            index.add(player, pokemon, pokemon)
+    for position, event in enumerate(log.of("switch", "replace")):
+        check_budget(position)
+        ident = parse_ident(event.args[0]) if len(event.args) > 1 else None
+        if not ident or not parse_species(event.args[1]):
+            continue
+        player = f"p{ident[0]}"
+        nickname = ident[1].strip()
+        pokemon = parse_species(event.args[1]).strip()
 
         if pokemon == "Mimikyu-Busted":
             pokemon = "Mimikyu"
 
-        all_pokemon[player][pokemon] = nickname
-        base_pokemon = re.sub(r"-.*", "", pokemon)
-        if base_pokemon in all_pokemon[player] and all_pokemon[player][base_pokemon] == nickname:
-            if base_pokemon != pokemon:
-                del all_pokemon[player][base_pokemon]
-    transform_regex = re.compile(r"\|detailschange\|(p\d)[ab]: (.+?)\|([^,|]+)-(Mega|Terastal|Hero|Busted)")
-    for match in transform_regex.finditer(log):
-        player, nickname, base_pokemon, form = match.groups()
+        index.add(player, pokemon, nickname)
+        base_pokemon = pokemon.split("-", 1)[0]
+        if index.get_nickname(player, base_pokemon) == nickname and base_pokemon != pokemon:
+            index.remove(player, base_pokemon)
+    for event in log.of("detailschange"):
+        ident = parse_ident(event.args[0]) if len(event.args) > 1 else None
+        transform = split_form(parse_species(event.args[1])) if ident else None
+        if not transform:
+            continue
+        player = f"p{ident[0]}"
+        nickname = ident[1]
+        base_pokemon, form = transform
 
         if base_pokemon == "Mimikyu" and form == "Busted":
             transform_pokemon = "Mimikyu"
         else:
             transform_pokemon = base_pokemon + "-" + form
 
-        if (
-            base_pokemon in all_pokemon[player]
-            and all_pokemon[player][base_pokemon] == nickname
-            and base_pokemon != transform_pokemon
-        ):
-            del all_pokemon[player][base_pokemon]
+        if index.get_nickname(player, base_pokemon) == nickname and base_pokemon != transform_pokemon:
+            index.remove(player, base_pokemon)
 
-        all_pokemon[player][transform_pokemon] = nickname
-    return all_pokemon
+        index.add(player, transform_pokemon, nickname)
+    return index
+
+
+def get_replay_pokemon(json_data: Dict[str, List[str]]) -> Dict[str, Dict[str, str]]:
+    # Retrieves Pokemon names and groups them in terms of player. Each entry is a mapping from nickname to actual name.
+    return get_replay_index(json_data).species
 
 
 def get_revives(json_data: Dict[str, List[str]]) -> List[Tuple[str, str]]:
     # Retrieves a list of player and Pokemon for each Pokemon that was revived.
     revives = []
-    log = json_data.get("log", "")
-    revive_regex = re.compile(
-        r"\|p(\d)[ab]: ([^\|]+)\|Revival Blessing[\s\S]*?\-heal\|p(\d)[ab]: ([^\|\n]+)",
-        re.DOTALL,
-    )
-    for match in revive_regex.finditer(log):
-        player = f"p{match.group(3)}"
-        pokemon = match.group(4).strip()
-        revives.append((player, pokemon))
+    blessed = False
+    for event in get_log(json_data).events:
+        check_budget(event.index)
+        if blessed and event.kind == "-heal":
+            ident = parse_ident(event.args[0]) if event.args else None
+            if ident:
+                revives.append((f"p{ident[0]}", ident[1].strip()))
+                blessed = False
+        elif not blessed:
+            blessed = any(
+                field.startswith("Revival Blessing") and parse_ident(event.args[position])
+                for position, field in enumerate(event.args[1:])
+            )
     return revives
 
 
 def get_winner(json_data: Dict[str, List[str]]) -> str:
     # Retrieves the winner.
-    log_data = json_data.get("log", "")
-    winner = re.search(r"\|win\|(.+?)\n", log_data).group(1).strip()
-    return winner
+    for event in get_log(json_data).of("win"):
+        return "|".join(event.args).strip()
+    raise ValueError("No winner found in replay log.")
 
 
 def get_loser(json_data: Dict[str, List[str]]) -> str:
@@ -97,423 +170,280 @@ def get_loser(json_data: Dict[str, List[str]]) -> str:
             return name
 
 
-def get_difference(players: Dict[str, str], winner: str, revives: List[Tuple[str, str]], stats: Dict[str, Dict[str, Dict[str, int]]]) -> str:
+def get_difference(players: Dict[str, str], winner: str, revives: List[Tuple[str, str]], stats: Dict[str, Dict[str, PokemonStats]]) -> str:
     # Retrieves the point difference from winning player to losing player.
-    p1_deaths = sum(pokemon["deaths"] for pokemon in stats.get("p1", {}).values())
-    p2_deaths = sum(pokemon["deaths"] for pokemon in stats.get("p2", {}).values())
+    p1_deaths = sum(pokemon.deaths for pokemon in stats.get("p1", {}).values())
+    p2_deaths = sum(pokemon.deaths for pokemon in stats.get("p2", {}).values())
+    index = PokemonIndex.from_stats(stats)
     for player, pokemon in revives:
-        for _, pokemon_stats in stats.get(player, {}).items():
-            if pokemon_stats["nickname"] == pokemon:
-                if player == "p1":
-                    p1_deaths -= 1
-                else:
-                    p2_deaths -= 1
-                break
+        if index.get_species(player, pokemon) is not None:
+            if player == "p1":
+                p1_deaths -= 1
+            else:
+                p2_deaths -= 1
     if winner == players["p1"]:
         difference = f"({p2_deaths - p1_deaths}-0)"
     else:
         difference = f"({p1_deaths - p2_deaths}-0)"
     return difference
 
-def initialize_stats(pokemon_data: Dict[str, Dict[str, str]]) -> Dict[str, Dict[str, Dict[str, int]]]:
+def initialize_stats(pokemon_data: Dict[str, Dict[str, str]]) -> Dict[str, Dict[str, PokemonStats]]:
     # Initializes stats (player, nickname, kills, deaths) for each Pokemon.
-    stats: Dict[str, Dict[str, Dict[str, int]]] = {}
+    stats: Dict[str, Dict[str, PokemonStats]] = {}
     for player, pokemon in pokemon_data.items():
         stats[player] = {}
         for actual_pokemon, nickname in pokemon.items():
-            stats[player][actual_pokemon] = {"nickname": nickname, "kills": 0, "deaths": 0}
+            stats[player][actual_pokemon] = PokemonStats(nickname)
     return stats
 
-def process_stats(json_data: Dict[str, List[str]], stats: Dict[str, Dict[str, Dict[str, int]]], passive_kills: Optional[List[Tuple[str, str, str, str, str]]]) -> None:
+def get_faint_cause(log: ReplayLog, faint: Event) -> Optional[str]:
+    # Returns the passive cause logged within the 80 characters before the faint, if any.
+    window = faint.start - 80
+    causes = set()
+    for event in log.backward(faint.index):
+        if event.end <= window:
+            break
+        following = log.next_line(event)
+        if (
+            event.args
+            and following.kind == "faint"
+            and following.start == event.end + 1
+            and event.args[-1].startswith("[from] ")
+            and event.args[-1] != "[from] Leech Seed"
+            and event.end - len(event.args[-1]) >= window
+        ):
+            causes.add(event.args[-1][7:])
+        if "[from] Leech Seed" in event.args[:-1]:
+            position = event.args.index("[from] Leech Seed")
+            if (
+                event.args[position + 1].startswith("[of]")
+                and event.end - sum(len(field) + 1 for field in event.args[position:]) + 1 >= window
+            ):
+                causes.add("Leech Seed")
+    return next((cause for cause in FAINT_CAUSES if cause in causes), None)
+
+def process_stats(
+    json_data: Dict[str, List[str]],
+    stats: Dict[str, Dict[str, PokemonStats]],
+    passive_kills: Optional[List[PassiveKill]],
+    index: Optional[PokemonIndex] = None
+) -> None:
     # Updates the kill and death values for each Pokemon.
-    log = json_data.get("log", "")
-    faint_regex = re.compile(r"\|faint\|p(\d)[ab]: ([^\|\n]+)")
-    sandstorm_regex = re.compile(r"\[from\] Sandstorm\n\|faint\|")
-    poison_regex = re.compile(r"\[from\] psn\n\|faint\|")
-    burn_regex = re.compile(r"\[from\] brn\n\|faint\|")
-    spikes_regex = re.compile(r"\[from\] Spikes\n\|faint\|")
-    rocks_regex = re.compile(r"\[from\] Stealth Rock\n\|faint\|")
-    seed_regex = re.compile(r"\[from\] Leech Seed\|\[of\]")
-    for match in faint_regex.finditer(log):
-        fainted_player, fainted_pokemon = match.groups()
+    log = get_log(json_data)
+    if index is None:
+        index = PokemonIndex.from_stats(stats)
+    for faint, state in replay_state(log):
+        ident = parse_ident(faint.args[0]) if faint.args else None
+        if not ident:
+            continue
+        fainted_player, fainted_pokemon = ident
         fainted_pokemon = fainted_pokemon.strip()
-        event = match.start()
         player_key = f"p{fainted_player}"
-        for pokemon, data in stats[player_key].items():
-            if data["nickname"] == fainted_pokemon:
-                data["deaths"] += 1
-                break
-        actions = log[:event].split("\n")[::-1]
-        segment = log[event - 80 : event + 30]
-        if poison_regex.search(segment):
-            process_poison(fainted_player, fainted_pokemon, actions, stats, passive_kills)
-        elif burn_regex.search(segment):
-            process_burn(fainted_player, fainted_pokemon, actions, stats, passive_kills)
-        elif rocks_regex.search(segment):
-            process_rocks(fainted_player, fainted_pokemon, actions, stats, passive_kills)
-        elif spikes_regex.search(segment):
-            process_spikes(fainted_player, fainted_pokemon, actions, stats, passive_kills)
-        elif seed_regex.search(segment):
-            process_seed(fainted_player, fainted_pokemon, actions, stats, passive_kills)
-        elif sandstorm_regex.search(segment):
-            process_sandstorm(fainted_player, fainted_pokemon, actions, stats, passive_kills)
+        fainted_species = index.get_species(player_key, fainted_pokemon)
+        if fainted_species is not None:
+            stats[player_key][fainted_species].deaths += 1
+        cause = get_faint_cause(log, faint)
+        if cause == "psn":
+            process_poison(fainted_player, fainted_pokemon, state, stats, index, passive_kills)
+        elif cause == "brn":
+            process_burn(fainted_player, fainted_pokemon, state, stats, index, passive_kills)
+        elif cause == "Stealth Rock":
+            process_rocks(fainted_player, fainted_pokemon, state, stats, index, passive_kills)
+        elif cause == "Spikes":
+            process_spikes(fainted_player, fainted_pokemon, state, stats, index, passive_kills)
+        elif cause == "Leech Seed":
+            process_seed(fainted_player, fainted_pokemon, state, stats, index, passive_kills)
+        elif cause == "Sandstorm":
+            process_sandstorm(fainted_player, fainted_pokemon, state, stats, index, passive_kills)
         else:
-            process_direct(fainted_player, fainted_pokemon, actions, stats)
+            process_direct(fainted_player, fainted_pokemon, state, stats, index)
+
 
+def credit_passive_kill(
+    fainted_player: str,
+    fainted_pokemon: str,
+    source: Optional[Tuple[str, str]],
+    cause: str,
+    stats: Dict[str, Dict[str, PokemonStats]],
+    index: PokemonIndex,
+    passive_kills: Optional[List[PassiveKill]] = None
+):
+    # Credits a passive kill to the player and Pokemon that caused it.
+    if not source:
+        return
+    source_player, source_pokemon = source
+    killer = index.get_species(source_player, source_pokemon)
+    if killer is None:
+        return
+    stats[source_player][killer].kills += 1
+    if passive_kills is not None:
+        victim = get_original_pokemon(index, f"p{fainted_player}", fainted_pokemon)
+        passive_kills.append(PassiveKill(victim, killer, cause, f"p{fainted_player}", source_player))
 
 def process_sandstorm(
     fainted_player: str,
     fainted_pokemon: str,
-    actions: List[str], 
-    stats: Dict[str, Dict[str, Dict[str, int]]],
-    passive_kills: Optional[List[Tuple[str, str, str]]] = None
+    state: BattleState,
+    stats: Dict[str, Dict[str, PokemonStats]],
+    index: PokemonIndex,
+    passive_kills: Optional[List[PassiveKill]] = None
     ):
     # Processes kills from sandstorm.
-    sandstorm_starter = None
-    sandstorm_player = None
-    for action in actions:
-        sandstorm_match = re.search(
-            r"\|-weather\|Sandstorm\|\[from\] ability: ([^\|]+)\|\[of\] (p\d)a: ([^\|]+)",
-            action,
-        )
-        if sandstorm_match:
-            _, sandstorm_player, sandstorm_pokemon = sandstorm_match.groups()
-            sandstorm_starter = sandstorm_pokemon.strip()
-            break
-    if sandstorm_starter:
-        for pokemon, data in stats[sandstorm_player].items():
-            if data["nickname"] == sandstorm_starter:
-                data["kills"] += 1
-                if passive_kills is not None:
-                    victim = get_original_pokemon(stats, f"p{fainted_player}", fainted_pokemon)
-                    killer = get_original_pokemon(stats, sandstorm_player, sandstorm_starter)
-                    passive_kills.append((victim, killer, "Sandstorm", f"p{fainted_player}", sandstorm_player))
-                break
-
+    source = state.get_weather_setter("Sandstorm")
+    credit_passive_kill(fainted_player, fainted_pokemon, source, "Sandstorm", stats, index, passive_kills)
 
 def process_poison(
     fainted_player: str,
     fainted_pokemon: str,
-    actions: List[str],
-    stats: Dict[str, Dict[str, Dict[str, int]]],
-    passive_kills: Optional[List[Tuple[str, str, str]]] = None
+    state: BattleState,
+    stats: Dict[str, Dict[str, PokemonStats]],
+    index: PokemonIndex,
+    passive_kills: Optional[List[PassiveKill]] = None
 ):
     # Processes kills from toxic or poison.
-    poison_starter = None
-    poison_player = None
-    poison_found = False
-    for action in actions:
-        for toxic_move in ["Toxic", "Malignant Chain", "Toxic Spikes", "Toxic Chain"]:
-            if re.search(rf"\|p(\d)[ab]: ([^\|\n]+)\|{toxic_move}\|p(\d)[ab]: " + re.escape(fainted_pokemon), action):
-                if "-status" in actions[actions.index(action) - 1] and "tox" in actions[actions.index(action) - 1]:
-                    poison_match = re.search(rf"\|p(\d)[ab]: ([^\|\n]+)\|{toxic_move}\|p(\d)[ab]: ([^\|\n]+)", action)
-                    if poison_match:
-                        poison_player, poison_pokemon, _, poisoned_pokemon = poison_match.groups()
-                        if poisoned_pokemon.strip() == fainted_pokemon:
-                            poison_starter = poison_pokemon.strip()
-                            poison_player = f"p{poison_player}"
-                            if poison_player != f"p{fainted_player}":
-                                poison_found = True
-                                break
-            elif re.search(
-                r"\|-status\|p(\d)[ab]: "
-                + re.escape(fainted_pokemon)
-                + r"\|tox\|\[from\] ability: Toxic Chain\|\[of\] p(\d)[ab]: ([^\|\n]+)",
-                action,
-            ):
-                chain_match = re.search(
-                    r"\|-status\|p(\d)[ab]: "
-                    + re.escape(fainted_pokemon)
-                    + r"\|tox\|\[from\] ability: Toxic Chain\|\[of\] p(\d)[ab]: ([^\|\n]+)",
-                    action,
-                )
-                if chain_match:
-                    _, poison_player, poison_starter = chain_match.groups()
-                    poison_starter = poison_starter.strip()
-                    poison_player = f"p{poison_player}"
-                    if poison_player != f"p{fainted_player}":
-                        poison_found = True
-                        break
-
-        for poison_move in [
-            "Sludge", "Sludge Bomb", "Sludge Wave", "Gunk Shot", "Smog", "Poison Fang",
-            "Poison Jab", "Poison Sting", "Poison Tail", "Poison Gas", "Poison Powder",
-            "Fling", "Cross Poison", "Toxic Thread", "Twineedle", "Barb Barrage",
-            "Shell Side Arm", "Mortal Spin", "Dire Claw", "Secret Power",
-            "G-Max Befuddle", "G-Max Malodor", "G-Max Stun Shock", "Poison Point"
-        ]:
-            pattern = rf"\|p(\d)[ab]: ([^\|\n]+)\|{poison_move}\|p(\d)[ab]: " + re.escape(fainted_pokemon)
-            if re.search(pattern, action):
-                prev_action = actions[actions.index(action) - 2]
-                if "-status" in prev_action and "psn" in prev_action:
-                    match = re.search(rf"\|p(\d)[ab]: ([^\|\n]+)\|{poison_move}\|p(\d)[ab]: ([^\|\n]+)", action)
-                    if match:
-                        attacker_player, attacker_pokemon, target_player, target_pokemon = match.groups()
-                        if target_pokemon.strip() == fainted_pokemon:
-                            poison_starter = attacker_pokemon.strip()
-                            poison_player = f"p{attacker_player}"
-                            if poison_player != f"p{target_player}":
-                                poison_found = True
-                                break
-            elif re.search(
-                r"\|-status\|p(\d)[ab]: "
-                + re.escape(fainted_pokemon)
-                + r"\|psn\|\[from\] ability: Poison Point\|\[of\] p(\d)[ab]: ([^\|\n]+)",
-                action,
-            ):
-                point_match = re.search(
-                    r"\|-status\|p(\d)[ab]: "
-                    + re.escape(fainted_pokemon)
-                    + r"\|psn\|\[from\] ability: Poison Point\|\[of\] p(\d)[ab]: ([^\|\n]+)",
-                    action,
-                )
-                if point_match:
-                    _, poison_player, poison_starter = point_match.groups()
-                    poison_starter = poison_starter.strip()
-                    poison_player = f"p{poison_player}"
-                    if poison_player != f"p{fainted_player}":
-                        poison_found = True
-                        break
-        for ability in ["Psycho Shift", "Synchronize"]:
-            if re.search(
-                rf"\|p(\d)[ab]: ([^\|\n]+)\|ability: {ability}\n|-status\|p(\d)[ab]: " + re.escape(fainted_pokemon) + r"\|(tox|psn)",
-                action,
-            ):
-                if "-status" in action and ("tox" in action or "psn" in action):
-                    full_action = actions[actions.index(action) + 1] + "\n" + action
-                    ability_match = re.search(
-                        rf"\|p(\d)[ab]: ([^\|\n]+)\|ability: {ability}\n\|-status\|p(\d)[ab]: ([^\|\n]+)",
-                        full_action,
-                    )
-                    if ability_match:
-                        ability_player, ability_pokemon, _, target_pokemon = ability_match.groups()
-                        if target_pokemon.strip() == fainted_pokemon:
-                            poison_starter = ability_pokemon.strip()
-                            poison_player = f"p{ability_player}"
-                            if poison_player != f"p{fainted_player}":
-                                poison_found = True
-                                break
-    if poison_found and poison_starter:
-        for pokemon, data in stats[poison_player].items():
-            if data["nickname"] == poison_starter:
-                data["kills"] += 1
-                if passive_kills is not None:
-                    victim = get_original_pokemon(stats, f"p{fainted_player}", fainted_pokemon)
-                    killer = get_original_pokemon(stats, poison_player, poison_starter)
-                    passive_kills.append((victim, killer, "Poison", f"p{fainted_player}", poison_player))
-                break
+    source = state.get_status_source("psn", fainted_player, fainted_pokemon)
+    credit_passive_kill(fainted_player, fainted_pokemon, source, "Poison", stats, index, passive_kills)
 
 def process_burn(
     fainted_player: str,
     fainted_pokemon: str,
-    actions: List[str],
-    stats: Dict[str, Dict[str, Dict[str, int]]],
-    passive_kills: Optional[List[Tuple[str, str, str]]] = None
+    state: BattleState,
+    stats: Dict[str, Dict[str, PokemonStats]],
+    index: PokemonIndex,
+    passive_kills: Optional[List[PassiveKill]] = None
 ):
     # Processes kills from burn.
-    burn_starter = None
-    burn_player = None
-    burn_found = False
-    for action in actions:
-        for burn_move in [
-            "Will-O-Wisp", "Lava Plume", "Flamethrower", "Fire Blast", "Flare Blitz",
-            "Heat Wave", "Scald", "Scorching Sands", "Blaze Kick", "Fire Fang", 
-            "Fire Punch", "Ember", "Flame Wheel", "Burning Jealousy", "Inferno", 
-            "Pyro Ball", "Infernal Parade", "Blue Flare", "Searing Shot", 
-            "Steam Eruption", "Tri Attack", "Secret Power", "Fling", 
-            "Matcha Gotcha", "Sacred Fire", "Sandsear Storm"
-        ]:
-            pattern = rf"\|p(\d)[ab]: ([^\|\n]+)\|{burn_move}\|p(\d)[ab]: " + re.escape(fainted_pokemon)
-            if re.search(pattern, action):
-                prev_action = actions[actions.index(action) - 2]
-                if "-status" in prev_action and "brn" in prev_action:
-                    match = re.search(rf"\|p(\d)[ab]: ([^\|\n]+)\|{burn_move}\|p(\d)[ab]: ([^\|\n]+)", action)
-                    if match:
-                        attacker_player, attacker_pokemon, target_player, target_pokemon = match.groups()
-                        if target_pokemon.strip() == fainted_pokemon:
-                            burn_starter = attacker_pokemon.strip()
-                            burn_player = f"p{attacker_player}"
-                            if burn_player != f"p{target_player}":
-                                burn_found = True
-                                break
-            elif re.search(
-                r"\|-status\|p(\d)[ab]: "
-                + re.escape(fainted_pokemon)
-                + r"\|brn\|\[from\] ability: Flame Body\|\[of\] p(\d)[ab]: ([^\|\n]+)",
-                action,
-            ):
-                body_match = re.search(
-                    r"\|-status\|p(\d)[ab]: "
-                    + re.escape(fainted_pokemon)
-                    + r"\|brn\|\[from\] ability: Flame Body\|\[of\] p(\d)[ab]: ([^\|\n]+)",
-                    action,
-                )
-                if body_match:
-                    _, burn_player, burn_starter = body_match.groups()
-                    burn_starter = burn_starter.strip()
-                    burn_player = f"p{burn_player}"
-                    if burn_player != f"p{fainted_player}":
-                        burn_found = True
-                        break
-        for ability in ["Synchronize"]:
-            if re.search(
-                rf"\|p(\d)[ab]: ([^\|\n]+)\|ability: {ability}\n|-status\|p(\d)[ab]: " + re.escape(fainted_pokemon) + r"\|(brn)",
-                action,
-            ):
-                if "-status" in action and "brn" in action:
-                    full_action = actions[actions.index(action) + 1] + "\n" + action
-                    ability_match = re.search(
-                        rf"\|p(\d)[ab]: ([^\|\n]+)\|ability: {ability}\n\|-status\|p(\d)[ab]: ([^\|\n]+)",
-                        full_action,
-                    )
-                    if ability_match:
-                        ability_player, ability_pokemon, _, target_pokemon = ability_match.groups()
-                        if target_pokemon.strip() == fainted_pokemon:
-                            burn_starter = ability_pokemon.strip()
-                            burn_player = f"p{ability_player}"
-                            if burn_player != f"p{fainted_player}":
-                                burn_found = True
-                                break
-    if burn_found and burn_starter:
-        for pokemon, data in stats[burn_player].items():
-            if data["nickname"] == burn_starter:
-                data["kills"] += 1
-                if passive_kills is not None:
-                    victim = get_original_pokemon(stats, f"p{fainted_player}", fainted_pokemon)
-                    killer = get_original_pokemon(stats, burn_player, burn_starter)
-                    passive_kills.append((victim, killer, "Burn", f"p{fainted_player}", burn_player))
-                break
+    source = state.get_status_source("brn", fainted_player, fainted_pokemon)
+    credit_passive_kill(fainted_player, fainted_pokemon, source, "Burn", stats, index, passive_kills)
 
 def process_spikes(
     fainted_player: str,
     fainted_pokemon: str,
-    actions: List[str],
-    stats: Dict[str, Dict[str, Dict[str, int]]],
-    passive_kills: Optional[List[Tuple[str, str, str]]] = None
+    state: BattleState,
+    stats: Dict[str, Dict[str, PokemonStats]],
+    index: PokemonIndex,
+    passive_kills: Optional[List[PassiveKill]] = None
 ):
     # Processes kills from spikes.
-    spikes_starter = None
-    spikes_player = None
-    spikes_found = False
-    for action in actions:
-        spikes_match = re.search(
-            r"\|p(\d)[ab]: ([^\|\n]+)\|(Spikes|Ceaseless Edge)\|", action
-        )
-        if spikes_match:
-            spikes_player, spikes_pokemon, *_ = spikes_match.groups()
-            spikes_starter = spikes_pokemon.strip()
-            spikes_player = f"p{spikes_player}"
-            if spikes_player != f"p{fainted_player}":
-                spikes_found = True
-                break
-    if spikes_found and spikes_starter:
-        for pokemon, data in stats[spikes_player].items():
-            if data["nickname"] == spikes_starter:
-                data["kills"] += 1
-                if passive_kills is not None:
-                    victim = get_original_pokemon(stats, f"p{fainted_player}", fainted_pokemon)
-                    killer = get_original_pokemon(stats, spikes_player, spikes_starter)
-                    passive_kills.append((victim, killer, "Spikes", f"p{fainted_player}", spikes_player))
-                break
+    source = state.get_hazard_setter("Spikes", fainted_player)
+    credit_passive_kill(fainted_player, fainted_pokemon, source, "Spikes", stats, index, passive_kills)
 
 def process_rocks(
     fainted_player: str,
     fainted_pokemon: str,
-    actions: List[str],
-    stats: Dict[str, Dict[str, Dict[str, int]]],
-    passive_kills: Optional[List[Tuple[str, str, str]]] = None
+    state: BattleState,
+    stats: Dict[str, Dict[str, PokemonStats]],
+    index: PokemonIndex,
+    passive_kills: Optional[List[PassiveKill]] = None
 ):
     # Processes kills from Stealth Rocks.
-    rocks_starter = None
-    rocks_player = None
-    rocks_found = False
-    for action in actions:
-        rocks_match = re.search(r"\|p(\d)[ab]: ([^\|\n]+)\|Stealth Rock\|", action)
-        if rocks_match:
-            rocks_player, rocks_pokemon = rocks_match.groups()
-            rocks_starter = rocks_pokemon.strip()
-            rocks_player = f"p{rocks_player}"
-            if rocks_player != f"p{fainted_player}":
-                rocks_found = True
-                break
-    if rocks_found and rocks_starter:
-        for pokemon, data in stats[rocks_player].items():
-            if data["nickname"] == rocks_starter:
-                data["kills"] += 1
-                if passive_kills is not None:
-                    victim = get_original_pokemon(stats, f"p{fainted_player}", fainted_pokemon)
-                    killer = get_original_pokemon(stats, rocks_player, rocks_starter)
-                    passive_kills.append((victim, killer, "Stealth Rock", f"p{fainted_player}", rocks_player))
-                break
+    source = state.get_hazard_setter("Stealth Rock", fainted_player)
+    credit_passive_kill(fainted_player, fainted_pokemon, source, "Stealth Rock", stats, index, passive_kills)
 
 def process_seed(
     fainted_player: str,
     fainted_pokemon: str,
-    actions: List[str],
-    stats: Dict[str, Dict[str, Dict[str, int]]],
-    passive_kills: Optional[List[Tuple[str, str, str]]] = None
+    state: BattleState,
+    stats: Dict[str, Dict[str, PokemonStats]],
+    index: PokemonIndex,
+    passive_kills: Optional[List[PassiveKill]] = None
 ):
-    leech_starter = None
-    leech_player = None
-    for action in actions:
-        leech_match = re.search(
-            r"\|[^\|]+\|\[from\] Leech Seed\|\[of\] p(\d)[ab]: ([^\|\n]+)",
-            action,
-        )
-        if leech_match:
-            leech_player, leech_pokemon = leech_match.groups()
-            leech_starter = leech_pokemon.strip()
-            leech_player = f"p{leech_player}"
-            if leech_player != f"p{fainted_player}":
-                break
-    if leech_starter and leech_player:
-        for pokemon, data in stats[leech_player].items():
-            if data["nickname"] == leech_starter:
-                data["kills"] += 1
-                if passive_kills is not None:
-                    victim = get_original_pokemon(stats, f"p{fainted_player}", fainted_pokemon)
-                    killer = get_original_pokemon(stats, leech_player, leech_starter)
-                    passive_kills.append((victim, killer, "Leech Seed", f"p{fainted_player}", leech_player))
-                break
+    # Processes kills from Leech Seed.
+    source = state.get_seeder(fainted_player)
+    credit_passive_kill(fainted_player, fainted_pokemon, source, "Leech Seed", stats, index, passive_kills)
 
 def process_direct(
     fainted_player: str,
     fainted_pokemon: str,
-    actions: List[str],
-    stats: Dict[str, Dict[str, Dict[str, int]]],
+    state: BattleState,
+    stats: Dict[str, Dict[str, PokemonStats]],
+    index: PokemonIndex,
 ):
     # Processes normal kills that result in one Pokemon directly killing another.
-    for action in actions:
-        killer = re.search(r"^\|move\|p(\d)[ab]: ([^|]+)\|", action)
-        if killer and killer.group(1) != fainted_player:
-            killer_player, killer_pokemon = killer.groups()
-            killer_pokemon = killer_pokemon.strip()
-            player_key = f"p{killer_player}"
-            kill_found = False
-            for pokemon, data in stats[player_key].items():
-                if data["nickname"] == killer_pokemon:
-                    data["kills"] += 1
-                    kill_found = True
-                    break
-            if kill_found:
-                break
-
-def get_stats(json_data: Dict[str, List[str]]
-    ) -> Tuple[Dict[str, Dict[str, Dict[str, int]]], List[Tuple[str, str, str, str, str]]]:
+    player_key = f"p{get_opponent(fainted_player)}"
+    killer_pokemon = state.get_attacker(
+        fainted_player, lambda nickname: index.get_species(player_key, nickname) is not None
+    )
+    if killer_pokemon is not None:
+        stats[player_key][index.get_species(player_key, killer_pokemon)].kills += 1
+
+def get_stats(json_data: Dict[str, List[str]]) -> ReplayResult:
     # Returns the updated stats and a list of passive KOs.
-    pokemon = get_replay_pokemon(json_data)
-    stats = initialize_stats(pokemon)
-    passive_kills: List[Tuple[str, str, str, str, str]] = []
-    process_stats(json_data, stats, passive_kills)
-    return stats, passive_kills
+    index = get_replay_index(json_data)
+    stats = initialize_stats(index.species)
+    passive_kills: List[PassiveKill] = []
+    process_stats(json_data, stats, passive_kills, index)
+    return ReplayResult(stats, passive_kills)
+
+class Replay:
+    # A replay's JSON data, with every value derived from it computed at most once and within one CPU budget.
+    def __init__(self, json_data: Dict[str, List[str]], budget: Optional[ReplayBudget] = None):
+        self.json_data = json_data
+        self.budget = budget if budget is not None else ReplayBudget()
+
+    @cached_property
+    def log(self) -> ReplayLog:
+        # Retrieves the tokenized replay log.
+        with self.budget:
+            return get_log(self.json_data)
+
+    @cached_property
+    def players(self) -> Dict[str, str]:
+        # Retrieves player names.
+        return get_replay_players(self.json_data)
+
+    @cached_property
+    def winner(self) -> str:
+        # Retrieves the winner.
+        with self.budget:
+            return get_winner(self.json_data)
+
+    @cached_property
+    def loser(self) -> str:
+        # Retrieves the losing player.
+        for id, name in self.players.items():
+            if name != self.winner:
+                return name
+
+    @cached_property
+    def revives(self) -> List[Tuple[str, str]]:
+        # Retrieves the player and Pokemon for each Pokemon that was revived.
+        with self.budget:
+            return get_revives(self.json_data)
+
+    @cached_property
+    def result(self) -> ReplayResult:
+        # Retrieves the stats and passive KOs.
+        with self.budget:
+            return get_stats(self.json_data)
+
+    @property
+    def stats(self) -> Dict[str, Dict[str, PokemonStats]]:
+        # Retrieves the kills and deaths of each Pokemon grouped by player.
+        return self.result.stats
+
+    @property
+    def passive_kills(self) -> List[PassiveKill]:
+        # Retrieves the passive KOs.
+        return self.result.passive_kills
+
+    @cached_property
+    def difference(self) -> str:
+        # Retrieves the point difference from winning player to losing player.
+        return get_difference(self.players, self.winner, self.revives, self.stats)
+
+    @cached_property
+    def message(self) -> str:
+        # Retrieves the final message.
+        return create_message(self.players, self.winner, self.loser, self.difference, self.stats, self.passive_kills)
 
 def create_message(
         players: Dict[str, str], 
         winner: str, 
         loser: str, 
         difference: str, 
-        stats: Dict[str, Dict[str, Dict[str, int]]],
-        passive_kills: Optional[List[Tuple[str, str, str, str, str]]] = None
+        stats: Dict[str, Dict[str, PokemonStats]],
+        passive_kills: Optional[List[PassiveKill]] = None
 ) -> str:
     # Creates and returns the final message.
     winner_key = next(key for key, value in players.items() if value == winner)
@@ -522,28 +452,23 @@ def create_message(
     message += f"**{winner}'s Pokemon:**\n"
     winner_message = ""
     for pokemon, data in stats[winner_key].items():
-        kills = data["kills"]
-        deaths = data["deaths"]
+        kills = data.kills
+        deaths = data.deaths
         winner_message += f"{pokemon} (Kills: {kills}, Deaths: {deaths})\n"
     message += f"||```\n{winner_message.strip()}\n```||\n"
     message += f"**{loser}'s Pokemon:**\n"
     loser_message = ""
     for pokemon, data in stats[loser_key].items():
-        kills = data["kills"]
-        deaths = data["deaths"]
+        kills = data.kills
+        deaths = data.deaths
         loser_message += f"{pokemon} (Kills: {kills}, Deaths: {deaths})\n"
     message += f"||```\n{loser_message.strip()}\n```||\n"
     if passive_kills:
         passive_lines = []
         for entry in passive_kills:
-            if len(entry) == 5:
-                victim, killer, cause, v_key, k_key = entry
-                victim_name = players.get(v_key, v_key)
-                killer_name = players.get(k_key, k_key)
-                passive_lines.append(f"[{victim_name}] {victim} died from [{killer_name}] {killer}'s {cause}")
-            else:
-                victim, killer, cause = entry
-                passive_lines.append(f"{victim} died from {killer}'s {cause}")
+            victim_name = players.get(entry.victim_player, entry.victim_player)
+            killer_name = players.get(entry.killer_player, entry.killer_player)
+            passive_lines.append(f"[{victim_name}] {entry.victim} died from [{killer_name}] {entry.killer}'s {entry.cause}")
         message += f"**Passive KOs:**\n"
         message += f"||```\n" + "\n".join(passive_lines) + "\n```||\n"
     return message
@@ -0,0 +1,68 @@
+"""
+Compact records for the stats computed from a Pokemon Showdown replay.
+"""
+
+from typing import Optional, Dict, List, Tuple
+
+
+class PokemonStats:
+    # The nickname, kills and deaths of one Pokemon in a replay.
+    __slots__ = ("nickname", "kills", "deaths")
+
+    def __init__(self, nickname: str, kills: int = 0, deaths: int = 0):
+        self.nickname = nickname
+        self.kills = kills
+        self.deaths = deaths
+
+    def to_dict(self) -> Dict[str, object]:
+        # Returns the stats as a dictionary with "nickname", "kills" and "deaths" keys.
+        return {"nickname": self.nickname, "kills": self.kills, "deaths": self.deaths}
+
+
+class PassiveKill:
+    # A Pokemon that died to a passive cause, along with the Pokemon credited for it and both players.
+    __slots__ = ("victim", "killer", "cause", "victim_player", "killer_player")
+
+    def __init__(self, victim: str, killer: str, cause: str, victim_player: str, killer_player: str):
+        self.victim = victim
+        self.killer = killer
+        self.cause = cause
+        self.victim_player = victim_player
+        self.killer_player = killer_player
+
+    def to_tuple(self) -> Tuple[str, str, str, str, str]:
+        # Returns the passive kill as a (victim, killer, cause, victim player, killer player) tuple.
+        return (self.victim, self.killer, self.cause, self.victim_player, self.killer_player)
+
+
+class ReplayResult:
+    # The stats of every Pokemon grouped by player, along with the passive KOs of a replay.
+    __slots__ = ("stats", "passive_kills")
+
+    def __init__(
+        self,
+        stats: Dict[str, Dict[str, PokemonStats]],
+        passive_kills: Optional[List[PassiveKill]] = None,
+    ):
+        self.stats = stats
+        self.passive_kills = passive_kills if passive_kills is not None else []
+
+    def to_dict(self) -> Dict[str, Dict[str, Dict[str, object]]]:
+        # Returns the stats as nested dictionaries of player, Pokemon and stat name.
+        return {
+            player: {pokemon: data.to_dict() for pokemon, data in pokemon_stats.items()}
+            for player, pokemon_stats in self.stats.items()
+        }
+
+    def to_json(self) -> Dict[str, object]:
+        # Returns the stats and passive kills as JSON-serializable data.
+        return {"stats": self.to_dict(), "passive_kills": [kill.to_tuple() for kill in self.passive_kills]}
+
+    @staticmethod
+    def from_json(data: Dict[str, object]) -> "ReplayResult":
+        # Rebuilds a result from the data returned by to_json.
+        stats = {
+            player: {pokemon: PokemonStats(**values) for pokemon, values in pokemon_stats.items()}
+            for player, pokemon_stats in data["stats"].items()
+        }
+        return ReplayResult(stats, [PassiveKill(*kill) for kill in data["passive_kills"]])
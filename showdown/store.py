@@ -0,0 +1,164 @@
+"""
+A compressed on-disk cache of Pokemon Showdown replay JSON and the results derived from it, keyed by replay ID.
+"""
+
+import os
+import json
+import asyncio
+import zlib
+import hashlib
+import tempfile
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, List, Tuple, Callable, TypeVar
+from showdown.replay import *
+from showdown.pool import *
+from http_client import *
+from errors import *
+
+REPLAY_CACHE_DIR = os.getenv("REPLAY_CACHE_DIR", os.path.join(".cache", "replays"))
+REPLAY_CACHE_BYTES = int(os.getenv("REPLAY_CACHE_BYTES", str(256 * 1024 * 1024)))
+RESULT_CACHE_BYTES = int(os.getenv("RESULT_CACHE_BYTES", str(64 * 1024 * 1024)))
+MEMOIZED_VALUES = ("players", "result")
+DEPENDENT_VALUES = {"message": ("winner", "difference")}
+
+T = TypeVar("T")
+
+
+def get_replay_id(replay_link: str) -> str:
+    # Returns the replay ID at the end of a cleaned replay link, such as "gen9ou-2000000000".
+    return replay_link.rstrip("/").rsplit("/", 1)[-1]
+
+
+class ReplayStore:
+    # Compressed replay JSON files in one directory, evicting the least recently used files beyond a total size.
+    def __init__(self, directory: str = REPLAY_CACHE_DIR, max_bytes: int = REPLAY_CACHE_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.sizes: Optional["OrderedDict[str, int]"] = None
+        self.total = 0
+
+    def get_path(self, replay_id: str) -> str:
+        # Returns the file holding the replay, named by the hash of its ID.
+        return os.path.join(self.directory, hashlib.sha256(replay_id.encode()).hexdigest() + ".json.z")
+
+    def load_sizes(self) -> "OrderedDict[str, int]":
+        # Reads the size of every cached file once, ordered from least to most recently used.
+        if self.sizes is None:
+            os.makedirs(self.directory, exist_ok=True)
+            entries = []
+            for entry in os.scandir(self.directory):
+                if entry.is_file() and entry.name.endswith(".json.z"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, entry.path, stat.st_size))
+            self.sizes = OrderedDict((path, size) for _, path, size in sorted(entries))
+            self.total = sum(self.sizes.values())
+        return self.sizes
+
+    def get(self, replay_id: str) -> Optional[Dict[str, List[str]]]:
+        # Returns the cached replay JSON, or None if the replay is not cached or its file is unreadable.
+        sizes = self.load_sizes()
+        path = self.get_path(replay_id)
+        if path not in sizes:
+            return None
+        try:
+            with open(path, "rb") as file:
+                json_data = json.loads(zlib.decompress(file.read()))
+            os.utime(path)
+        except (OSError, ValueError, zlib.error):
+            self.discard(path)
+            return None
+        sizes.move_to_end(path)
+        return json_data
+
+    def put(self, replay_id: str, json_data: Dict[str, List[str]]) -> None:
+        # Writes the replay JSON atomically, then evicts the least recently used replays beyond the size limit.
+        sizes = self.load_sizes()
+        path = self.get_path(replay_id)
+        payload = zlib.compress(json.dumps(json_data, separators=(",", ":")).encode(), 6)
+        descriptor, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(descriptor, "wb") as file:
+                file.write(payload)
+            os.replace(temp_path, path)
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return
+        self.total += len(payload) - sizes.pop(path, 0)
+        sizes[path] = len(payload)
+        while self.total > self.max_bytes and len(sizes) > 1:
+            self.discard(next(iter(sizes)))
+
+    def update(self, replay_id: str, values: Dict[str, object]) -> None:
+        # Merges values into the cached JSON object of the replay, writing it even if nothing was cached yet.
+        entry = self.get(replay_id) or {}
+        entry.update(values)
+        self.put(replay_id, entry)
+
+    def discard(self, path: str) -> None:
+        # Removes a cached file and forgets its size.
+        self.total -= self.load_sizes().pop(path, 0)
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+replay_store = ReplayStore()
+result_store = ReplayStore(os.path.join(REPLAY_CACHE_DIR, "results"), RESULT_CACHE_BYTES)
+replay_flights = SingleFlight()
+store_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="replay-store")
+
+
+async def run_in_store(function: Callable[..., T], *args: object) -> T:
+    # Runs a replay store operation off the event loop, since it reads, writes and compresses files. Operations run one at a time so the stores' sizes are never changed from two threads.
+    return await asyncio.get_running_loop().run_in_executor(store_executor, function, *args)
+
+
+def get_result_key(replay_id: str) -> str:
+    # Returns the key of the results derived from a replay by the current parser version.
+    return f"{replay_id}@v{PARSER_VERSION}"
+
+
+async def fetch_replay(replay_link: str) -> Dict[str, List[str]]:
+    # Returns the JSON of a replay link, reading it from the replay store and fetching it only if it is not cached.
+    replay_id = get_replay_id(replay_link)
+    json_data = await run_in_store(replay_store.get, replay_id)
+    if json_data is not None:
+        return json_data
+    json_data = await http_client.get_json(replay_link + ".json")
+    if json_data is None:
+        raise InvalidReplay(replay_link)
+    await run_in_store(replay_store.put, replay_id, json_data)
+    return json_data
+
+
+def encode_value(name: str, value: object) -> object:
+    # Converts a Replay attribute into JSON-serializable data.
+    return value.to_json() if name == "result" else value
+
+
+def decode_value(name: str, value: object) -> object:
+    # Converts data from encode_value back into the Replay attribute.
+    return ReplayResult.from_json(value) if name == "result" else value
+
+
+async def analyze_replay_link(replay_link: str, *names: str) -> Tuple[object, ...]:
+    # Returns the requested Replay attributes of a replay link, analyzing the replay only if they are not memoized for the current parser version.
+    key = get_result_key(get_replay_id(replay_link))
+    entry = await run_in_store(result_store.get, key) or {}
+    if all(name in entry for name in names):
+        return tuple(decode_value(name, entry[name]) for name in names)
+    dependents = tuple(value for name in names for value in DEPENDENT_VALUES.get(name, ()))
+    computed = tuple(dict.fromkeys(MEMOIZED_VALUES + dependents + names))
+    values = await replay_flights.run((key, computed), lambda: memoize_replay(replay_link, key, computed))
+    return tuple(values[computed.index(name)] for name in names)
+
+
+async def memoize_replay(replay_link: str, key: str, names: Tuple[str, ...]) -> Tuple[object, ...]:
+    # Analyzes the replay in the pool and memoizes the requested Replay attributes alongside any already memoized.
+    values = await analyze_in_pool(await fetch_replay(replay_link), *names)
+    entry = {name: encode_value(name, value) for name, value in zip(names, values)}
+    await run_in_store(result_store.update, key, entry)
+    return values
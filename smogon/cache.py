@@ -0,0 +1,90 @@
+"""
+A process-wide cache of parsed Smogon set data with a memory ceiling, backed by the compressed JSON of every generation loaded.
+"""
+
+import os
+import sys
+import json
+import zlib
+from collections import OrderedDict
+from typing import Optional, Dict, Tuple, Any
+
+# Room for all nine generations, which get_data_size puts at about 130 MB, so loading every one of them evicts none. That leaves most of a 512 MB worker dyno for the bot itself and the species index, which is kept outside this cache.
+SMOGON_CACHE_BYTES = int(os.getenv("SMOGON_CACHE_BYTES", str(160 * 1024 * 1024)))
+
+
+def pack_gen(body: bytes) -> bytes:
+    # Returns the JSON body of a generation's set data compressed.
+    return zlib.compress(body, 6)
+
+
+def unpack_gen(pack: bytes) -> Optional[Tuple[Dict[str, Any], int]]:
+    # Returns the set data in compressed JSON along with its size, or None if it is not valid compressed JSON.
+    try:
+        data = json.loads(zlib.decompress(pack))
+    except (zlib.error, ValueError):
+        return None
+    return data, get_data_size(data)
+
+
+def read_gen(body: bytes) -> Optional[Tuple[Dict[str, Any], int, bytes]]:
+    # Returns a downloaded JSON body of set data parsed, along with its size and compressed JSON, or None if it is not valid JSON.
+    pack = pack_gen(body)
+    loaded = unpack_gen(pack)
+    return (loaded[0], loaded[1], pack) if loaded is not None else None
+
+
+def get_data_size(data: Any) -> int:
+    # Estimates the memory used by parsed JSON data, counting every container and value it holds.
+    size = 0
+    stack = [data]
+    while stack:
+        value = stack.pop()
+        size += sys.getsizeof(value)
+        if isinstance(value, dict):
+            stack.extend(value.keys())
+            stack.extend(value.values())
+        elif isinstance(value, list):
+            stack.extend(value)
+    return size
+
+
+class GenCache:
+    # Parsed set data per generation along with values derived from it, evicting the least recently used generations beyond a memory ceiling.
+    def __init__(self, max_bytes: int = SMOGON_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.entries: "OrderedDict[str, Tuple[Dict[str, Any], int, Dict[Any, Any]]]" = OrderedDict()
+        self.total = 0
+
+    def get(self, generation: str) -> Optional[Dict[str, Any]]:
+        # Returns the cached data for the generation, marking it as recently used.
+        entry = self.entries.get(generation)
+        if entry is None:
+            return None
+        self.entries.move_to_end(generation)
+        return entry[0]
+
+    def get_derived(self, generation: str) -> Optional[Dict[Any, Any]]:
+        # Returns the values derived from the cached data of the generation, which are dropped along with that data, or None if it is not cached.
+        entry = self.entries.get(generation)
+        return entry[2] if entry is not None else None
+
+    def put(self, generation: str, data: Dict[str, Any], size: Optional[int] = None) -> None:
+        # Caches the data for the generation, measuring it unless its size is given, then evicts the least recently used generations beyond the ceiling.
+        self.discard(generation)
+        size = get_data_size(data) if size is None else size
+        self.entries[generation] = (data, size, {})
+        self.total += size
+        while self.total > self.max_bytes and len(self.entries) > 1:
+            self.discard(next(iter(self.entries)))
+
+    def discard(self, generation: str) -> None:
+        # Removes the generation from the cache.
+        entry = self.entries.pop(generation, None)
+        if entry is not None:
+            self.total -= entry[1]
+
+
+gen_cache = GenCache()
+# The compressed JSON of every generation loaded so far, which evicted generations are reloaded from without a download.
+gen_packs: Dict[str, bytes] = {}
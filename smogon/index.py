@@ -0,0 +1,271 @@
+"""
+Indexes which generations and formats each Pokemon has Smogon sets in.
+"""
+
+import random
+from typing import Optional, Dict, List, Set, Tuple, Any
+from smogon.search import *
+from smogon.trie import *
+from smogon.similar import *
+
+FORM_PREFIXES = {
+    "Mega": ["Mega"],
+    "Alola": ["Alola", "Alolan"],
+    "Galar": ["Galar", "Galarian"],
+    "Hisui": ["Hisui", "Hisuian"],
+    "Paldea": ["Paldea", "Paldean"],
+}
+
+
+def get_aliases(pokemon: str) -> List[str]:
+    # Returns other names a form may be written as, such as "Mega-Charizard-X" or "Alolan-Ninetales".
+    base, _, form = pokemon.partition("-")
+    name, _, rest = form.partition("-")
+    return [
+        "-".join(part for part in (prefix, base, rest) if part)
+        for prefix in FORM_PREFIXES.get(name, [])
+    ]
+
+
+def get_gen_number(generation: str) -> int:
+    # Returns the number of a generation key such as "gen9".
+    return int(generation[3:])
+
+
+def get_gen_dict() -> Dict[str, str]:
+    # Returns generation dictionary.
+    return {
+        "gen1": "rb",
+        "gen2": "gs",
+        "gen3": "rs",
+        "gen4": "dp",
+        "gen5": "bw",
+        "gen6": "xy",
+        "gen7": "sm",
+        "gen8": "ss",
+        "gen9": "sv",
+    }
+
+
+def get_gen_key(generation: str) -> Optional[str]:
+    # Returns the generation key for a generation written in number form (Gen9) or letter form (SV).
+    generation = generation.lower()
+    for gen_key, letters in get_gen_dict().items():
+        if generation in (gen_key, letters):
+            return gen_key
+    return None
+
+
+class KeyIndex:
+    # The Pokemon keys of one generation's set data, looked up by lowercase name, then by normalized name or alias, or else by the closest name.
+    def __init__(self, data: Dict[str, Any]):
+        self.lowered: Dict[str, str] = {}
+        self.normalized: Dict[str, str] = {}
+        for key in data:
+            self.lowered.setdefault(key.lower(), key)
+            self.normalized.setdefault(normalize_term(key), key)
+        for key in data:
+            for alias in get_aliases(key):
+                self.normalized.setdefault(normalize_term(alias), key)
+        self.names = BigramIndex(self.normalized)
+
+    def find(self, pokemon: str) -> Optional[str]:
+        # Returns the key for the Pokemon name if it exists.
+        key = self.lowered.get(pokemon.lower())
+        if key is None:
+            key = self.normalized.get(normalize_term(pokemon))
+        return key
+
+    def find_closest(self, pokemon: str) -> Optional[Tuple[int, str]]:
+        # Returns the distance and key of the closest name to a misspelled Pokemon name, if one is close enough.
+        name = normalize_term(pokemon)
+        matches = self.names.find(name, get_max_distance(name))
+        if not matches:
+            return None
+        distance, match = matches[0]
+        return distance, self.normalized[match]
+
+
+class SpeciesIndex:
+    # Normalized species names mapped to the generations they have sets in, each with its formats in Smogon's order, along with every set they have and the search index and name tries of each generation.
+    def __init__(self):
+        self.species: Dict[str, Dict[str, List[str]]] = {}
+        self.generations: Set[str] = set()
+        self.keys: Dict[str, KeyIndex] = {}
+        self.sets: Dict[str, List[Tuple[str, str, str, str]]] = {}
+        self.searches: Dict[str, GenSearchIndex] = {}
+        self.completions: Dict[str, GenCompletions] = {}
+
+    def add_gen(self, generation: str, data: Dict[str, Any]) -> None:
+        # Indexes every Pokemon in the set data of a generation, replacing what was indexed for it before.
+        if generation not in get_gen_dict():
+            raise ValueError(f"Unknown generation: {generation}")
+        if generation in self.generations:
+            for formats in self.species.values():
+                formats.pop(generation, None)
+            for name, sets in list(self.sets.items()):
+                sets = [entry for entry in sets if entry[1] != generation]
+                if sets:
+                    self.sets[name] = sets
+                else:
+                    del self.sets[name]
+        for pokemon, pokemon_data in data.items():
+            self.species.setdefault(normalize_term(pokemon), {})[generation] = list(pokemon_data)
+            sets = [
+                (pokemon, generation, format, set_name)
+                for format, format_data in pokemon_data.items()
+                for set_name in format_data
+            ]
+            if sets:
+                name = normalize_term(pokemon)
+                self.sets[name] = self.sets.get(name, []) + sets
+        for pokemon, pokemon_data in data.items():
+            for alias in get_aliases(pokemon):
+                self.species.setdefault(normalize_term(alias), {}).setdefault(generation, list(pokemon_data))
+        self.keys[generation] = KeyIndex(data)
+        self.searches[generation] = GenSearchIndex(data)
+        self.completions[generation] = GenCompletions(data, {pokemon: get_aliases(pokemon) for pokemon in data})
+        self.generations.add(generation)
+
+    def copy(self) -> "SpeciesIndex":
+        # Returns an index that can be changed without affecting this one.
+        index = SpeciesIndex()
+        index.species = {name: dict(formats) for name, formats in self.species.items()}
+        index.generations = set(self.generations)
+        index.keys = dict(self.keys)
+        index.sets = dict(self.sets)
+        index.searches = dict(self.searches)
+        index.completions = dict(self.completions)
+        return index
+
+    def with_gens(self, gens: Dict[str, Dict[str, Any]]) -> "SpeciesIndex":
+        # Returns a copy of this index with the set data of each generation indexed, leaving this one unchanged.
+        index = self.copy()
+        for generation, data in gens.items():
+            index.add_gen(generation, data)
+        return index
+
+    def replace(self, other: "SpeciesIndex") -> None:
+        # Swaps in everything indexed by another index at once, so lookups never see a partly built index.
+        self.species, self.generations, self.keys, self.sets, self.searches, self.completions = (
+            other.species, other.generations, other.keys, other.sets, other.searches, other.completions
+        )
+
+    def get_generations(self, pokemon: str) -> List[str]:
+        # Returns the generations with sets for the Pokemon, from oldest to newest.
+        return sorted(self.species.get(normalize_term(pokemon), {}), key=get_gen_number)
+
+    def find_key(self, pokemon: str, generation: str) -> Optional[str]:
+        # Returns the key of the Pokemon in the generation's set data, or None if it has no sets there.
+        keys = self.keys.get(generation)
+        return keys.find(pokemon) if keys else None
+
+    def suggest(self, pokemon: str, generation: Optional[str] = None) -> Optional[str]:
+        # Returns the Pokemon key closest to a misspelled name, from the generation or else the closest in any, newest generation first.
+        generations = [generation] if generation else sorted(self.keys, key=get_gen_number, reverse=True)
+        best = None
+        for gen_key in generations:
+            closest = self.keys[gen_key].find_closest(pokemon) if gen_key in self.keys else None
+            if closest and (best is None or closest[0] < best[0]):
+                best = closest
+        return best[1] if best else None
+
+    def sample_sets(self, count: int) -> List[Tuple[str, str, str, str]]:
+        # Returns a random (Pokemon, Generation, Format, Set) for each of up to count different Pokemon with sets.
+        pokemon = random.sample(list(self.sets), k=min(count, len(self.sets)))
+        return [random.choice(self.sets[name]) for name in pokemon]
+
+    def search(
+        self, terms: List[str], generation: Optional[str] = None, format: Optional[str] = None
+    ) -> List[Tuple[str, str, str, str]]:
+        # Returns the (Pokemon, Generation, Format, Set) of every set running all the terms, newest generation first.
+        generations = [generation] if generation else sorted(self.searches, key=get_gen_number, reverse=True)
+        return [
+            (pokemon, gen_key, set_format, set_name)
+            for gen_key in generations
+            if gen_key in self.searches
+            for pokemon, set_format, set_name in self.searches[gen_key].search(terms, format)
+        ]
+
+    def has_format(self, format: str, generation: Optional[str] = None) -> bool:
+        # Returns whether any set is in the format, optionally only within the generation.
+        generations = [generation] if generation else list(self.searches)
+        return any(
+            format.lower() in self.searches[gen_key].formats
+            for gen_key in generations
+            if gen_key in self.searches
+        )
+
+    def get_formats(self, pokemon: str, generation: str) -> List[str]:
+        # Returns the formats with sets for the Pokemon in the generation.
+        return self.species.get(normalize_term(pokemon), {}).get(generation, [])
+
+    def get_sets(self, pokemon: str) -> List[Tuple[str, str, str, str]]:
+        # Returns the (Pokemon, Generation, Format, Set) of every set the Pokemon has, also finding it by an alias.
+        sets = self.sets.get(normalize_term(pokemon))
+        if sets is None:
+            keys = {self.find_key(pokemon, generation) for generation in self.get_generations(pokemon)}
+            sets = [entry for key in keys if key for entry in self.sets.get(normalize_term(key), [])]
+        return sets
+
+    def complete(
+        self, kind: str, prefix: str, generation: Optional[str] = None, limit: int = COMPLETION_LIMIT
+    ) -> List[str]:
+        # Returns the species, formats or set_names starting with the prefix, from the generation or else newest generation first.
+        generations = [generation] if generation else sorted(self.completions, key=get_gen_number, reverse=True)
+        names: List[str] = []
+        for gen_key in generations:
+            if gen_key not in self.completions:
+                continue
+            for name in getattr(self.completions[gen_key], kind).complete(prefix):
+                if name not in names:
+                    names.append(name)
+                    if len(names) >= limit:
+                        return names
+        return names
+
+    def complete_species(self, prefix: str, generation: Optional[str] = None) -> List[str]:
+        # Returns the Pokemon whose names or aliases start with the prefix.
+        return self.complete("species", prefix, generation)
+
+    def complete_formats(
+        self, prefix: str, pokemon: Optional[str] = None, generation: Optional[str] = None
+    ) -> List[str]:
+        # Returns the formats starting with the prefix, only those with sets for the Pokemon if one is given.
+        if not pokemon or not self.get_generations(pokemon):
+            return self.complete("formats", prefix, generation)
+        generations = [generation] if generation else reversed(self.get_generations(pokemon))
+        prefix = normalize_term(prefix)
+        formats: List[str] = []
+        for gen_key in generations:
+            for format in self.get_formats(pokemon, gen_key):
+                if normalize_term(format).startswith(prefix) and format not in formats:
+                    formats.append(format)
+        return formats[:COMPLETION_LIMIT]
+
+    def complete_set_names(
+        self,
+        prefix: str,
+        pokemon: Optional[str] = None,
+        generation: Optional[str] = None,
+        format: Optional[str] = None,
+    ) -> List[str]:
+        # Returns the set names starting with the prefix, only those of the Pokemon in the generation and format if given.
+        if not pokemon or not self.get_generations(pokemon):
+            return self.complete("set_names", prefix, generation)
+        generation = generation or self.get_generations(pokemon)[-1]
+        format = format or next(iter(self.get_formats(pokemon, generation)), None)
+        prefix = normalize_term(prefix)
+        set_names: List[str] = []
+        for _, gen_key, set_format, set_name in self.get_sets(pokemon):
+            if (
+                gen_key == generation
+                and set_format == format
+                and normalize_term(set_name).startswith(prefix)
+                and set_name not in set_names
+            ):
+                set_names.append(set_name)
+        return set_names[:COMPLETION_LIMIT]
+
+
+species_index = SpeciesIndex()
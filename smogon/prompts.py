@@ -0,0 +1,85 @@
+"""
+Keeps the state of each giveset prompt for a limited time and up to a limited number of prompts.
+"""
+
+import os
+import asyncio
+from time import monotonic
+from collections import OrderedDict
+import discord
+from typing import Optional, Dict, Tuple
+
+PROMPT_TTL = int(os.getenv("PROMPT_TTL", str(24 * 60 * 60)))
+PROMPT_LIMIT = int(os.getenv("PROMPT_LIMIT", "10000"))
+PROMPT_REPORT_SECONDS = 3600
+
+
+class PromptState:
+    # The first row message of a prompt, the resolved sets and selected button of each row, and the set shown for each row.
+    __slots__ = ("first_row", "choices", "selected", "sets", "expires")
+
+    def __init__(self, expires: float):
+        self.first_row: Optional[discord.Message] = None
+        self.choices: Dict[str, Dict[str, Tuple[str, str, str, str, dict]]] = {}
+        self.selected: Dict[str, str] = {}
+        self.sets: Dict[str, str] = {}
+        self.expires = expires
+
+
+class PromptStore:
+    # Prompt states that expire once unused for the TTL, evicting the least recently used beyond the size limit.
+    def __init__(self, ttl: float = PROMPT_TTL, max_size: int = PROMPT_LIMIT):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.prompts: "OrderedDict[str, PromptState]" = OrderedDict()
+        self.created = 0
+        self.expired = 0
+        self.evicted = 0
+
+    def create(self, prompt_key: str) -> PromptState:
+        # Starts the state of a new prompt, making room for it if the store is full.
+        self.purge()
+        while len(self.prompts) >= self.max_size:
+            self.prompts.popitem(last=False)
+            self.evicted += 1
+        state = PromptState(monotonic() + self.ttl)
+        self.prompts[prompt_key] = state
+        self.created += 1
+        return state
+
+    def get(self, prompt_key: str) -> Optional[PromptState]:
+        # Returns the state of a live prompt, extending its lifetime, or None if it expired or was evicted.
+        self.purge()
+        state = self.prompts.get(prompt_key)
+        if state is None:
+            return None
+        state.expires = monotonic() + self.ttl
+        self.prompts.move_to_end(prompt_key)
+        return state
+
+    def purge(self) -> None:
+        # Removes expired prompts, which are always the least recently used ones.
+        now = monotonic()
+        while self.prompts and next(iter(self.prompts.values())).expires <= now:
+            self.prompts.popitem(last=False)
+            self.expired += 1
+
+    def get_metrics(self) -> Dict[str, int]:
+        # Returns the number of live prompts along with how many were created, expired and evicted.
+        self.purge()
+        return {
+            "live": len(self.prompts),
+            "created": self.created,
+            "expired": self.expired,
+            "evicted": self.evicted,
+        }
+
+
+prompt_store = PromptStore()
+
+
+async def report_prompts(every_seconds: int = PROMPT_REPORT_SECONDS) -> None:
+    # Logs the prompt store metrics periodically.
+    while True:
+        await asyncio.sleep(every_seconds)
+        print(f"[prompts] {prompt_store.get_metrics()}")
@@ -0,0 +1,65 @@
+"""
+Inverted indexes for searching Smogon sets by move, item, ability, Tera Type and nature.
+"""
+
+from typing import Optional, Dict, List, Set, Tuple, Any
+
+SEARCH_FIELDS = {
+    "moves": "{}",
+    "item": "{}",
+    "ability": "{}",
+    "teratypes": "Tera {}",
+    "nature": "{}",
+}
+
+
+def normalize_term(term: str) -> str:
+    # Normalizes a search term or Pokemon name for comparison: lowercased, no spaces/hyphens.
+    return term.replace(" ", "").replace("-", "").lower()
+
+
+def get_terms(moveset: Dict[str, Any]) -> Set[str]:
+    # Returns every normalized move, item, ability, Tera Type and nature a set can run, including its slash options.
+    terms = set()
+    for field, template in SEARCH_FIELDS.items():
+        values = moveset.get(field, [])
+        stack = list(values) if isinstance(values, list) else [values]
+        while stack:
+            value = stack.pop()
+            if isinstance(value, list):
+                stack.extend(value)
+            elif isinstance(value, str) and value:
+                terms.add(normalize_term(template.format(value)))
+    return terms
+
+
+class GenSearchIndex:
+    # The sets of one generation, with the sets running each term and the sets in each format.
+    def __init__(self, data: Dict[str, Any]):
+        self.entries: List[Tuple[str, str, str]] = []
+        self.terms: Dict[str, Set[int]] = {}
+        self.formats: Dict[str, Set[int]] = {}
+        for pokemon, pokemon_data in data.items():
+            for format, format_data in pokemon_data.items():
+                for set_name, moveset in format_data.items():
+                    entry = len(self.entries)
+                    self.entries.append((pokemon, format, set_name))
+                    self.formats.setdefault(format.lower(), set()).add(entry)
+                    if isinstance(moveset, dict):
+                        for term in get_terms(moveset):
+                            self.terms.setdefault(term, set()).add(entry)
+
+    def search(self, terms: List[str], format: Optional[str] = None) -> List[Tuple[str, str, str]]:
+        # Returns the (Pokemon, Format, Set) of every set running all the terms, optionally only in the format.
+        postings = [self.terms.get(normalize_term(term), set()) for term in terms]
+        if format:
+            postings.append(self.formats.get(format.lower(), set()))
+        if not postings:
+            return []
+        postings.sort(key=len)
+        matches = set(postings[0])
+        for posting in postings[1:]:
+            if not matches:
+                break
+            matches &= posting
+        return [self.entries[entry] for entry in sorted(matches)]
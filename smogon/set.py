@@ -2,159 +2,211 @@
 General functions in getting Pokemon Smogon sets.
 """
 
-import aiohttp
 import random
+import asyncio
 import discord
 from discord.ui import Button, View
 from discord.ext import commands
 from concurrent.futures import ThreadPoolExecutor
-from typing import Optional, Dict, List, Tuple, Any
+from typing import Optional, Dict, List, Tuple, Union, Any, NamedTuple
 from uuid import uuid4
+from http_client import *
+from smogon.cache import *
+from smogon.index import *
+from smogon.prompts import *
 from errors import *
 
-selected_states = {}
-selected_sets = {}
+SEARCH_LIMIT = 20
 
+gen_flights = SingleFlight()
+index_lock = asyncio.Lock()
 
-def normalize_species_name(name: str) -> str:
-    # Normalize a species name for comparison: lowercased, no spaces/hyphens.
-    return name.replace(" ", "").replace("-", "").lower()
 
-
-def find_pokemon_key(data: Dict[str, Any], pokemon: str) -> Optional[str]:
+def find_pokemon_key(data: Dict[str, Any], pokemon: str, generation: Optional[str] = None) -> Optional[str]:
     # Given the Smogon JSON for a gen and a user-supplied name, return the canonical key from the JSON if it exists.
-    target = normalize_species_name(pokemon)
+    if generation in species_index.keys:
+        return species_index.find_key(pokemon, generation)
+    target = normalize_term(pokemon)
     for key in data.keys():
         if key.lower() == pokemon.lower():
             return key
     for key in data.keys():
-        if normalize_species_name(key) == target:
+        if normalize_term(key) == target:
             return key
     return None
 
-def get_gen_dict() -> Dict[str, str]:
-    # Returns generation dictionary.
-    return {
-        "gen1": "rb",
-        "gen2": "gs",
-        "gen3": "rs",
-        "gen4": "dp",
-        "gen5": "bw",
-        "gen6": "xy",
-        "gen7": "sm",
-        "gen8": "ss",
-        "gen9": "sv",
-    }
 
+gen_completions = PrefixTrie(
+    [(gen_key, gen_key) for gen_key in get_gen_dict()]
+    + [(letters, gen_key) for gen_key, letters in get_gen_dict().items()]
+)
 
-async def get_latest_gen(pokemon: str) -> Optional[str]:
-    # Returns the latest eligible generation for the given Pokemon.
-    gen_dict = get_gen_dict()
-    generations = list(gen_dict.keys())[::-1]
-    async with aiohttp.ClientSession() as session:
-        for gen_key in generations:
-            url = f"https://pkmn.github.io/smogon/data/sets/{gen_key}.json"
-            async with session.get(url) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    if find_pokemon_key(data, pokemon):
-                        return gen_key
-    return None
 
+def complete_generations(prefix: str, pokemon: Optional[str] = None) -> List[str]:
+    # Returns the generations written in number or letter form starting with the prefix, only those with sets for the Pokemon if it has any.
+    generations = species_index.get_generations(pokemon) if pokemon else []
+    completions = gen_completions.complete(prefix)
+    if generations:
+        return [generation for generation in reversed(generations) if generation in completions]
+    return sorted(completions, key=get_gen_number, reverse=True)
 
-async def get_random_gen(pokemon: str) -> Optional[str]:
-    # Returns a random eligible gen using the Smogon API given a Pokemon.
-    gen_dict = get_gen_dict()
-    generations = list(gen_dict.keys())
-    random.shuffle(generations)
-    async with aiohttp.ClientSession() as session:
-        for gen_key in generations:
-            url = f"https://pkmn.github.io/smogon/data/sets/{gen_key}.json"
-            async with session.get(url) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    if find_pokemon_key(data, pokemon):
-                        return gen_key
-    return None
 
-
-async def get_first_format(pokemon: str, generation: str) -> Optional[str]:
-    # Returns the first format given the Pokemon and Generation.
-    url = f"https://pkmn.github.io/smogon/data/sets/{generation}.json"
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url) as response:
-            if response.status == 200:
-                data = await response.json()
-                pokemon_key = find_pokemon_key(data, pokemon)
-                if not pokemon_key:
-                    return None
-                pokemon_data = data[pokemon_key]
-                first_format = next(iter(pokemon_data), None)
-                return first_format
-    return None
+def get_gen_url(generation: str) -> str:
+    # Returns the URL of the Smogon set data for the generation.
+    return f"https://pkmn.github.io/smogon/data/sets/{generation}.json"
 
 
-async def get_random_format(pokemon: str, generation: str) -> Optional[str]:
-    # Returns a random eligible format using the Smogon API given a Pokemon and Generation.
-    url = f"https://pkmn.github.io/smogon/data/sets/{generation}.json"
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url) as response:
-            if response.status == 200:
-                data = await response.json()
-                pokemon_key = find_pokemon_key(data, pokemon)
-                if not pokemon_key:
-                    return None
-                pokemon_data = data[pokemon_key]
-                formats = list(pokemon_data.keys())
-                if formats:
-                    return random.choice(formats)
-    return None
+async def get_gen_data(generation: str) -> Optional[Dict[str, Any]]:
+    # Returns the Smogon set data for the generation from the cache, fetching it only if it is not cached, or None if it is not a known generation or cannot be fetched.
+    generation = get_gen_key(generation)
+    if generation is None:
+        return None
+    data = gen_cache.get(generation)
+    if data is None:
+        data = await gen_flights.run(generation, lambda: load_gen_data(generation))
+    return data
 
 
-async def get_set_names(
-    pokemon: str, generation: Optional[str] = None, format: Optional[str] = None
-) -> Optional[List[str]]:
-    # Returns all set names associated with the Pokemon, Generation and Format provided. If no Generation, assumed to be latest one, and if no Format, assumed to be first one.
-    pokemon = format_pokemon(pokemon)
-    if not generation:
-        generation = await get_latest_gen(pokemon)
-        if generation is None:
+async def load_gen_data(generation: str) -> Optional[Dict[str, Any]]:
+    # Loads the set data for a known generation key from its compressed JSON, downloading it only if there is none, and caches it. Decompressing and parsing run off the event loop. Only a generation that is not indexed yet is indexed, since keeping indexed generations current is left to the refresher.
+    if generation not in get_gen_dict():
+        return None
+    loop = asyncio.get_running_loop()
+    pack = gen_packs.get(generation)
+    if pack is None:
+        response = await http_client.fetch(get_gen_url(generation))
+        if response is None or response.status != 200:
             return None
-    url = f"https://pkmn.github.io/smogon/data/sets/{generation}.json"
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url) as response:
-            if response.status == 200:
-                data = await response.json()
-                pokemon_key = find_pokemon_key(data, pokemon)
-                if not pokemon_key:
-                    return None
-                pokemon_data = data[pokemon_key]
-                if not format:
-                    format = await get_first_format(pokemon_key, generation)
-                if format and format in pokemon_data:
-                    format_data = pokemon_data[format]
-                    set_names = list(format_data.keys())
-                    return set_names
+        pack = await loop.run_in_executor(None, pack_gen, response.body)
+    loaded = await loop.run_in_executor(None, unpack_gen, pack)
+    if loaded is None:
+        gen_packs.pop(generation, None)
+        return None
+    data, size = loaded
+    gen_packs.setdefault(generation, pack)
+    gen_cache.put(generation, data, size)
+    await index_gens({generation: data}, reindex=False)
+    return data
+
+
+async def index_gens(gens: Dict[str, Dict[str, Any]], reindex: bool = True) -> None:
+    # Indexes the set data of the generations on a copy of the species index off the event loop, then swaps the copy in. Changes are made one at a time so none is lost, and without reindex, generations already indexed are left as they are.
+    async with index_lock:
+        if not reindex:
+            gens = {generation: data for generation, data in gens.items() if generation not in species_index.generations}
+        if not gens:
+            return
+        index = await asyncio.get_running_loop().run_in_executor(None, species_index.with_gens, gens)
+        species_index.replace(index)
+
+
+async def load_species_index() -> SpeciesIndex:
+    # Fetches every generation that is not indexed yet, then returns the species index.
+    missing = [gen_key for gen_key in get_gen_dict() if gen_key not in species_index.generations]
+    if missing:
+        await asyncio.gather(*(get_gen_data(gen_key) for gen_key in missing))
+    return species_index
+
+
+class ResolvedSets(NamedTuple):
+    # The Pokemon key, Generation and Format a request resolved to, along with the movesets of every set in it.
+    pokemon: str
+    generation: str
+    format: str
+    movesets: Dict[str, dict]
+
+
+def find_sets(
+    data: Dict[str, Any], pokemon: str, generation: str, format: Optional[str] = None
+) -> Optional[ResolvedSets]:
+    # Returns the sets of the Pokemon in the Format within one generation's set data. If no Format, assumed to be first one.
+    pokemon_key = find_pokemon_key(data, pokemon, generation)
+    pokemon_data = data.get(pokemon_key) if pokemon_key else None
+    if pokemon_data is None:
+        return None
+    if not format:
+        format = next(iter(pokemon_data), None)
+    if format and format in pokemon_data:
+        return ResolvedSets(pokemon_key, generation, format, pokemon_data[format])
     return None
 
 
-async def get_random_set(pokemon: str, generation: str, format: str) -> Optional[str]:
-    # Returns a random eligible set name given a Pokemon, Generation, and Format.
-    url = f"https://pkmn.github.io/smogon/data/sets/{generation}.json"
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url) as response:
-            if response.status == 200:
-                data = await response.json()
-                pokemon_key = find_pokemon_key(data, pokemon)
-                if not pokemon_key:
-                    return None
-                pokemon_data = data[pokemon_key]
-                if format in pokemon_data:
-                    format_data = pokemon_data[format]
-                    set_names = list(format_data.keys())
-                    if set_names:
-                        return random.choice(set_names)
-    return None
+async def resolve_requests(
+    requests: List[Dict[str, Optional[str]]]
+) -> List[Optional[ResolvedSets]]:
+    # Returns the sets for every request in order, loading each generation involved once and resolving all of its requests together.
+    index = await load_species_index()
+    plan: Dict[str, List[int]] = {}
+    for position, request in enumerate(requests):
+        generation = request.get("generation")
+        if generation:
+            generation = get_gen_key(generation)
+        else:
+            generations = index.get_generations(format_pokemon(request["pokemon"]))
+            generation = generations[-1] if generations else None
+        if generation:
+            plan.setdefault(generation, []).append(position)
+    generations = list(plan)
+    gen_data = await asyncio.gather(*(get_gen_data(generation) for generation in generations))
+    resolved: List[Optional[ResolvedSets]] = [None] * len(requests)
+    for generation, data in zip(generations, gen_data):
+        if data is None:
+            continue
+        for position in plan[generation]:
+            request = requests[position]
+            resolved[position] = find_sets(
+                data, format_pokemon(request["pokemon"]), generation, request.get("format")
+            )
+    return resolved
+
+
+def correct_requests(index: SpeciesIndex, requests: List[Dict[str, Optional[str]]]) -> List[str]:
+    # Replaces every Pokemon name without sets, in the Generation if one is given, with the closest name that has them, returning the names used instead.
+    corrections = []
+    for request in requests:
+        pokemon = format_pokemon(request["pokemon"])
+        generation = get_gen_key(request.get("generation") or "")
+        if index.find_key(pokemon, generation) if generation else index.get_generations(pokemon):
+            continue
+        suggestion = index.suggest(pokemon, generation)
+        if suggestion:
+            request["pokemon"] = suggestion
+            corrections.append(f"**{suggestion}**")
+    return corrections
+
+
+def get_set_key(set_name: str) -> str:
+    # Returns the set name as it appears in button IDs, lowercased and without spaces.
+    return set_name.lower().replace(" ", "")
+
+
+def parse_search(
+    index: SpeciesIndex, query: str
+) -> Tuple[Optional[str], Optional[str], List[str]]:
+    # Splits a search into its optional Generation and Format and the comma-separated moves, items, abilities, Tera Types and natures.
+    parts = [part.strip() for part in query.split(",")]
+    words = parts[0].split()
+    generation = get_gen_key(words[0]) if words else None
+    if generation:
+        words = words[1:]
+    format = None
+    if words and index.has_format(words[0], generation):
+        format = words.pop(0).lower()
+    parts[0] = " ".join(words)
+    return generation, format, [part for part in parts if part]
+
+
+def get_search_results(
+    results: List[Tuple[str, str, str, str]], limit: int = SEARCH_LIMIT
+) -> str:
+    # Returns the search results as lines of Pokemon, Generation, Format and Set, noting how many are left out past the limit.
+    lines = [
+        f"**{pokemon}** {generation.upper()} {format.upper()}: {set_name}"
+        for pokemon, generation, format, set_name in results[:limit]
+    ]
+    if len(results) > limit:
+        lines.append(f"...and {len(results) - limit} more.")
+    return "\n".join(lines)
 
 
 def get_prompt(requests: List[Dict[str, Optional[str]]]) -> str:
@@ -230,8 +282,15 @@ def format_pokemon(pokemon: str) -> str:
     return " ".join(words)
 
 
-def format_set(pokemon: str, moveset: dict) -> str:
-    # Returns the formatted set data from the pokemon and moveset information given.
+def get_options(value: Any, template: str) -> Union[str, List[str]]:
+    # Returns the line for a set field, or the list of possible lines if the field is a random choice.
+    if isinstance(value, list):
+        return [template.format(option) for option in value] if value else ""
+    return template.format(value) if value else ""
+
+
+def get_stat_options(values: Any) -> Union[str, List[str]]:
+    # Returns the EV or IV spread line, or the list of possible lines if the spread is a random choice.
     stats = {
         "hp": "HP",
         "atk": "Atk",
@@ -240,78 +299,64 @@ def format_set(pokemon: str, moveset: dict) -> str:
         "spd": "SpD",
         "spe": "Spe",
     }
+    spreads = values if isinstance(values, list) and all(isinstance(item, dict) for item in values) else [values]
+    lines = [" / ".join(f"{value} {stats[key]}" for key, value in spread.items() if value > 0) for spread in spreads]
+    return lines[0] if len(lines) == 1 else lines
+
+
+def get_set_template(pokemon: str, moveset: dict) -> List[Union[str, List[str]]]:
+    # Returns the lines of the formatted set, where a line with random choices is the list of its possible lines.
     pokemon_str = format_pokemon(pokemon)
-    item = moveset.get("item", "")
-    ability = moveset.get("ability", "")
-    evs = moveset.get("evs", {})
-    ivs = moveset.get("ivs", {})
-    tera = moveset.get("teratypes", "")
-    nature = moveset.get("nature", "")
-    moves = []
-    if isinstance(item, list):
-        item_str = f" @ {random.choice(item)}" if item else ""
-    else:
-        item_str = f" @ {item}" if item else ""
-    if isinstance(ability, list):
-        ability_str = f"Ability: {random.choice(item)}" if ability else ""
-    else:
-        ability_str = f"Ability: {ability}" if ability else ""
-    if isinstance(evs, list) and all(isinstance(item, dict) for item in evs):
-        evs = random.choice(evs)
-    evs = " / ".join(f"{value} {stats[key]}" for key, value in evs.items() if value > 0)
-    evs_str = f"EVs: {evs}" if evs else ""
-    if isinstance(ivs, list) and all(isinstance(item, dict) for item in ivs):
-        ivs = random.choice(ivs)
-    ivs = " / ".join(f"{value} {stats[key]}" for key, value in ivs.items() if value > 0)
-    ivs_str = f"IVs: {ivs}" if ivs else ""
-    if isinstance(tera, list):
-        tera_str = f"Tera Type: {random.choice(tera)}" if tera else ""
-    else:
-        tera_str = f"Tera Type: {tera}" if tera else ""
-    if isinstance(nature, list):
-        nature_str = f"{random.choice(nature)} Nature" if nature else ""
-    else:
-        nature_str = f"{nature} Nature" if nature else ""
-    for move in moveset.get("moves", []):
-        if isinstance(move, list):
-            selected_move = random.choice(move)
-            moves.append(f"- {selected_move}")
-        else:
-            moves.append(f"- {move}")
-    moves_str = "\n".join(moves)
-    formatted_set = f"{pokemon_str}{item_str}"
-    if ability_str:
-        formatted_set += f"\n{ability_str}"
-    if evs_str:
-        formatted_set += f"\n{evs_str}"
-    if ivs_str:
-        formatted_set += f"\n{ivs_str}"
-    if tera_str:
-        formatted_set += f"\n{tera_str}"
-    if nature_str:
-        formatted_set += f"\n{nature_str}"
-    formatted_set += f"\n{moves_str}"
-    return formatted_set.strip()
+    item = get_options(moveset.get("item", ""), " @ {}")
+    first_line = [pokemon_str + option for option in item] if isinstance(item, list) else pokemon_str + item
+    evs = get_stat_options(moveset.get("evs", {}))
+    ivs = get_stat_options(moveset.get("ivs", {}))
+    template = [
+        first_line,
+        get_options(moveset.get("ability", ""), "Ability: {}"),
+        [f"EVs: {option}" if option else "" for option in evs] if isinstance(evs, list) else (f"EVs: {evs}" if evs else ""),
+        [f"IVs: {option}" if option else "" for option in ivs] if isinstance(ivs, list) else (f"IVs: {ivs}" if ivs else ""),
+        get_options(moveset.get("teratypes", ""), "Tera Type: {}"),
+        get_options(moveset.get("nature", ""), "{} Nature"),
+    ]
+    template.extend(get_options(move, "- {}") for move in moveset.get("moves", []))
+    return [line[0] if isinstance(line, list) and len(set(line)) == 1 else line for line in template]
+
+
+def render_set(template: List[Union[str, List[str]]]) -> str:
+    # Returns the formatted set from its template, picking a random line wherever there is a choice.
+    lines = (line if isinstance(line, str) else random.choice(line) for line in template)
+    return "\n".join(line for line in lines if line)
+
+
+def get_formatted_set(pokemon: str, generation: str, format: str, set_name: str, moveset: dict) -> str:
+    # Returns the formatted set, reusing the text of sets without random choices and the template of sets with them. Both are kept with the generation's cached data, so they go when it is evicted or replaced.
+    key = ("set", pokemon, format, set_name)
+    templates = gen_cache.get_derived(generation)
+    cached = templates.get(key) if templates is not None else None
+    if cached is None or cached[0] is not moveset:
+        template = get_set_template(pokemon, moveset)
+        if all(isinstance(line, str) for line in template):
+            template = render_set(template)
+        cached = (moveset, template)
+        if templates is not None:
+            templates[key] = cached
+    template = cached[1]
+    return template if isinstance(template, str) else render_set(template)
 
 
 async def add_set(
-    prompt_key: str, message_key: str, button_key: str, set_data: str
+    state: PromptState, message_key: str, button_key: str, set_data: str
 ) -> None:
-    # Adds the set information to the selected sets and Pokemon information to the selected states.
-    selected_states.setdefault(prompt_key, [])
-    selected_sets.setdefault(prompt_key, {})
-    selected_states[prompt_key] = message_key + button_key
-    selected_sets[prompt_key][message_key] = [set_data]
-
-
-async def remove_set(prompt_key: str, message_key: str, button_key: str) -> None:
-    # Removes the set information from the selected sets and Pokemon information from the selected states.
-    selected_states[prompt_key] = [
-        state
-        for state in selected_states[prompt_key]
-        if not state.startswith(message_key)
-    ]
-    selected_sets[prompt_key].pop(message_key)
+    # Selects the button of a row in the prompt and adds its set information.
+    state.selected[message_key] = button_key
+    state.sets[message_key] = set_data
+
+
+async def remove_set(state: PromptState, message_key: str, button_key: str) -> None:
+    # Deselects the button of a row in the prompt and removes its set information.
+    state.selected.pop(message_key, None)
+    state.sets.pop(message_key, None)
 
 
 def update_buttons(
@@ -0,0 +1,68 @@
+"""
+Bigram indexes for finding the names closest to a misspelled one without comparing it against every name.
+"""
+
+from typing import Dict, List, Iterable, Set, Tuple
+
+
+def edit_distance(first: str, second: str, limit: int) -> int:
+    # Returns the Levenshtein distance between two strings, or limit + 1 as soon as it is known to be over the limit.
+    if abs(len(first) - len(second)) > limit:
+        return limit + 1
+    previous = list(range(len(second) + 1))
+    for row, first_char in enumerate(first, 1):
+        current = [row]
+        for column, second_char in enumerate(second, 1):
+            current.append(
+                min(
+                    previous[column] + 1,
+                    current[column - 1] + 1,
+                    previous[column - 1] + (first_char != second_char),
+                )
+            )
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+def get_max_distance(name: str) -> int:
+    # Returns how many edits a name of this length may be away from a match, allowing none for very short names.
+    return min(2, len(name) // 4)
+
+
+def get_bigrams(name: str) -> Set[str]:
+    # Returns the pairs of neighbouring characters in a name, marking its start and end.
+    padded = f"^{name}$"
+    return {padded[position:position + 2] for position in range(len(padded) - 1)}
+
+
+class BigramIndex:
+    # Names listed under each of their bigrams. An edit changes at most two bigrams, so only names sharing enough bigrams with a misspelling are compared against it.
+    __slots__ = ("names", "bigrams")
+
+    def __init__(self, names: Iterable[str] = ()):
+        self.names: List[str] = sorted(set(names))
+        self.bigrams: Dict[str, List[int]] = {}
+        for position, name in enumerate(self.names):
+            for bigram in get_bigrams(name):
+                self.bigrams.setdefault(bigram, []).append(position)
+
+    def find(self, name: str, max_distance: int) -> List[Tuple[int, str]]:
+        # Returns the (distance, name) of every name within the distance, closest first.
+        bigrams = get_bigrams(name)
+        required = len(bigrams) - 2 * max_distance
+        if required <= 0:
+            candidates = range(len(self.names))
+        else:
+            shared: Dict[int, int] = {}
+            for bigram in bigrams:
+                for position in self.bigrams.get(bigram, []):
+                    shared[position] = shared.get(position, 0) + 1
+            candidates = [position for position, count in shared.items() if count >= required]
+        matches = []
+        for position in candidates:
+            distance = edit_distance(name, self.names[position], max_distance)
+            if distance <= max_distance:
+                matches.append((distance, self.names[position]))
+        return sorted(matches)
@@ -0,0 +1,191 @@
+"""
+Keeps the Smogon set data and its indexes current, saving the compressed set data to a snapshot in the database (or a local file without one) so it is ready as soon as the bot starts.
+"""
+
+import os
+import random
+import pickle
+import asyncio
+import tempfile
+from typing import Optional, Dict, Tuple, Any
+from smogon.set import *
+from sheets.web import get_db_connection, DSN
+
+SMOGON_SNAPSHOT_PATH = os.getenv("SMOGON_SNAPSHOT_PATH", os.path.join(".cache", "smogon.pickle"))
+SNAPSHOT_VERSION = 7
+SMOGON_REFRESH_SECONDS = 3600
+
+gen_validators: Dict[str, Dict[str, str]] = {}
+snapshot_saved = False
+
+
+def encode_snapshot(packs: Dict[str, bytes], validators: Dict[str, Dict[str, str]]) -> bytes:
+    # Returns the compressed JSON and cache validators of every generation as bytes. Only byte strings are pickled, so this takes little time even on the event loop.
+    snapshot = {"version": SNAPSHOT_VERSION, "gens": packs, "validators": validators}
+    return pickle.dumps(snapshot, pickle.HIGHEST_PROTOCOL)
+
+
+def decode_snapshot(payload: bytes) -> Optional[Dict[str, Any]]:
+    # Returns the contents of a snapshot, or None if it is unreadable or from another snapshot version.
+    try:
+        snapshot = pickle.loads(payload)
+    except (pickle.UnpicklingError, EOFError, AttributeError, ImportError, ValueError, TypeError):
+        return None
+    if not isinstance(snapshot, dict) or snapshot.get("version") != SNAPSHOT_VERSION:
+        return None
+    return snapshot
+
+
+def write_snapshot_file(payload: bytes, path: str = SMOGON_SNAPSHOT_PATH) -> None:
+    # Writes a snapshot to a local file atomically.
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    descriptor, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(descriptor, "wb") as file:
+            file.write(payload)
+        os.replace(temp_path, path)
+    except OSError:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def read_snapshot_file(path: str = SMOGON_SNAPSHOT_PATH) -> Optional[bytes]:
+    # Returns a snapshot from a local file, or None if there is none.
+    try:
+        with open(path, "rb") as file:
+            return file.read()
+    except OSError:
+        return None
+
+
+async def store_snapshot(payload: bytes, path: str = SMOGON_SNAPSHOT_PATH) -> None:
+    # Saves a snapshot to the database so it outlives dyno restarts, or to a local file if there is no database.
+    if not DSN:
+        await asyncio.get_running_loop().run_in_executor(None, write_snapshot_file, payload, path)
+        return
+    pool = await get_db_connection()
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute("BEGIN;")
+            try:
+                await cur.execute(
+                    "CREATE TABLE IF NOT EXISTS smogon_snapshot (id INTEGER PRIMARY KEY, data BYTEA NOT NULL);"
+                )
+                await cur.execute(
+                    """
+                    INSERT INTO smogon_snapshot (id, data)
+                    VALUES (1, %s)
+                    ON CONFLICT (id)
+                    DO UPDATE SET data = EXCLUDED.data;
+                    """,
+                    (payload,),
+                )
+                await cur.execute("COMMIT;")
+            except Exception as e:
+                await cur.execute("ROLLBACK;")
+                raise e
+
+
+async def fetch_snapshot(path: str = SMOGON_SNAPSHOT_PATH) -> Optional[bytes]:
+    # Returns the saved snapshot from the database, or from a local file if there is no database, or None if there is none.
+    if not DSN:
+        return await asyncio.get_running_loop().run_in_executor(None, read_snapshot_file, path)
+    try:
+        pool = await get_db_connection()
+        async with pool.acquire() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute("SELECT to_regclass('smogon_snapshot') IS NOT NULL;")
+                (exists,) = await cur.fetchone()
+                if not exists:
+                    return None
+                await cur.execute("SELECT data FROM smogon_snapshot WHERE id = 1;")
+                result = await cur.fetchone()
+    except Exception as e:
+        print(f"[smogon] Could not read snapshot: {e}")
+        return None
+    return bytes(result[0]) if result else None
+
+
+async def load_snapshot(path: str = SMOGON_SNAPSHOT_PATH) -> bool:
+    # Takes the compressed JSON and validators of every generation not loaded yet from the saved snapshot, then indexes them one generation at a time off the event loop, returning whether there was a snapshot. Their set data is only cached once a command needs it.
+    global snapshot_saved
+    payload = await fetch_snapshot(path)
+    snapshot = decode_snapshot(payload) if payload is not None else None
+    if snapshot is None:
+        return False
+    snapshot_saved = True
+    for generation, pack in snapshot["gens"].items():
+        if generation in get_gen_dict() and generation not in gen_packs:
+            gen_packs[generation] = pack
+            if generation in snapshot["validators"]:
+                gen_validators[generation] = snapshot["validators"][generation]
+    loop = asyncio.get_running_loop()
+    for generation in reversed(list(get_gen_dict())):
+        if generation in gen_packs and generation not in species_index.generations:
+            loaded = await loop.run_in_executor(None, unpack_gen, gen_packs[generation])
+            if loaded is None:
+                gen_packs.pop(generation, None)
+                gen_validators.pop(generation, None)
+                continue
+            await index_gens({generation: loaded[0]}, reindex=False)
+    return True
+
+
+def get_validators(response: HttpResponse) -> Dict[str, str]:
+    # Returns the headers that revalidate a response, turned into the matching conditional request headers.
+    validators = {}
+    if response.headers.get("ETag"):
+        validators["If-None-Match"] = response.headers["ETag"]
+    if response.headers.get("Last-Modified"):
+        validators["If-Modified-Since"] = response.headers["Last-Modified"]
+    return validators
+
+
+async def revalidate_gen(generation: str) -> Optional[Tuple[bytes, Dict[str, str]]]:
+    # Returns the new JSON body of the generation's set data with its validators if it changed since it was loaded, or None if it is unchanged or cannot be fetched. Validators are only sent for a generation that has compressed JSON to fall back on.
+    headers = gen_validators.get(generation) if generation in gen_packs else None
+    response = await http_client.fetch(get_gen_url(generation), headers=headers)
+    if response is None or response.status != 200:
+        return None
+    return response.body, get_validators(response)
+
+
+async def refresh_smogon_data(path: str = SMOGON_SNAPSHOT_PATH) -> None:
+    # Revalidates every generation, then parses and reindexes only the ones that changed off the event loop and swaps in the new index. Afterwards saves the compressed JSON of every generation to the snapshot if anything is unsaved and every generation has been loaded.
+    global snapshot_saved
+    generations = list(get_gen_dict())
+    results = await asyncio.gather(*(revalidate_gen(generation) for generation in generations))
+    responses = {generation: result for generation, result in zip(generations, results) if result is not None}
+    loop = asyncio.get_running_loop()
+    changed = {}
+    for generation, (body, headers) in responses.items():
+        loaded = await loop.run_in_executor(None, read_gen, body)
+        if loaded is not None:
+            changed[generation] = (*loaded, headers)
+    if changed:
+        await index_gens({generation: data for generation, (data, _, _, _) in changed.items()})
+        for generation, (data, size, pack, headers) in changed.items():
+            gen_cache.put(generation, data, size)
+            gen_packs[generation] = pack
+            gen_validators[generation] = headers
+        snapshot_saved = False
+    if snapshot_saved or any(generation not in gen_packs for generation in generations):
+        return
+    await store_snapshot(encode_snapshot(dict(gen_packs), dict(gen_validators)), path)
+    snapshot_saved = True
+
+
+async def refresh_smogon(every_seconds: int = SMOGON_REFRESH_SECONDS) -> None:
+    # Loads the saved snapshot, then keeps the Smogon data current by revalidating it periodically.
+    try:
+        await load_snapshot()
+    except Exception as e:
+        print(f"[smogon] Could not load snapshot: {e}")
+    while True:
+        try:
+            await refresh_smogon_data()
+        except Exception as e:
+            print(f"[smogon] Refresh failed: {e}")
+        jitter = random.randint(-every_seconds // 10, every_seconds // 10)
+        await asyncio.sleep(max(0, every_seconds + jitter))
@@ -0,0 +1,68 @@
+"""
+Prefix tries for suggesting Pokemon, format and set names as they are typed.
+"""
+
+from typing import Dict, List, Iterable, Tuple, Any
+from smogon.search import normalize_term
+
+COMPLETION_LIMIT = 25
+
+
+class TrieNode:
+    # The next node for each character, and the first names in alphabetical order whose keys start with this node's prefix.
+    __slots__ = ("children", "names")
+
+    def __init__(self):
+        self.children: Dict[str, "TrieNode"] = {}
+        self.names: List[str] = []
+
+
+class PrefixTrie:
+    # Names under their normalized keys, with each node keeping its completions so a lookup only walks the prefix.
+    def __init__(self, entries: Iterable[Tuple[str, str]] = (), limit: int = COMPLETION_LIMIT):
+        self.root = TrieNode()
+        self.limit = limit
+        for key, name in sorted(entries, key=lambda entry: (entry[1].lower(), entry[0])):
+            self.add(key, name)
+
+    def add(self, key: str, name: str) -> None:
+        # Adds a name under a key, keeping it at every node along the key while the node has room.
+        node = self.root
+        self.keep(node, name)
+        for character in normalize_term(key):
+            node = node.children.setdefault(character, TrieNode())
+            self.keep(node, name)
+
+    def keep(self, node: TrieNode, name: str) -> None:
+        # Keeps the name at the node if it is new there and the node has room.
+        if len(node.names) < self.limit and name not in node.names:
+            node.names.append(name)
+
+    def complete(self, prefix: str) -> List[str]:
+        # Returns the names whose keys start with the prefix.
+        node = self.root
+        for character in normalize_term(prefix):
+            node = node.children.get(character)
+            if node is None:
+                return []
+        return list(node.names)
+
+
+class GenCompletions:
+    # The Pokemon, format and set name tries of one generation's set data.
+    def __init__(self, data: Dict[str, Any], aliases: Dict[str, List[str]]):
+        self.species = PrefixTrie(
+            [(pokemon, pokemon) for pokemon in data]
+            + [(alias, pokemon) for pokemon in data for alias in aliases.get(pokemon, [])]
+        )
+        self.formats = PrefixTrie(
+            {(format, format) for pokemon_data in data.values() for format in pokemon_data}
+        )
+        self.set_names = PrefixTrie(
+            {
+                (set_name, set_name)
+                for pokemon_data in data.values()
+                for format_data in pokemon_data.values()
+                for set_name in format_data
+            }
+        )